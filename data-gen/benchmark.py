@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""Benchmark the median degree pipelines over a transaction stream.
+
+Each command-line target (median_degree.py with its engine options, every
+engine registered in engines.ENGINES as `engine-NAME`, and control.py) runs as
+its own process, timed end to end, with its peak RSS read from the child's
+resource usage. Per-event latency percentiles come from pushing the stream
+through each registered engine in-process, one event at a time. Results are
+printed, or written, as json.
+
+With --baseline, throughput is compared against a stored result. The run fails
+if a target is slower than the baseline by more than --tolerance.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+sys.path.insert(0, SRC)
+
+from engines import ENGINES
+
+TARGETS = {
+    'median_degree': ['median_degree.py'],
+    'median_degree-histogram': ['median_degree.py', '--reducer', 'histogram'],
+    'median_degree-interned': ['median_degree.py', '--reducer', 'histogram', '--intern'],
+    'median_degree-partitioned': ['median_degree.py', '--reducer', 'partitioned', '--intern'],
+    'control': ['control.py'],
+}
+for name in ENGINES:
+    TARGETS['engine-%s' % name] = ['median_degree.py', '--engine', name]
+
+# the naive engine recounts every degree per event, it is the reference, not a contender
+DEFAULT_ENGINES = sorted(name for name in ENGINES if name != 'naive')
+
+
+def count_lines(path):
+    with open(path, 'r') as stream:
+        return sum(1 for line in stream)
+
+
+def run_target(name, path, events, window):
+    """Run a command-line target over the stream, returning throughput and peak RSS."""
+    command = [sys.executable] + TARGETS[name] + ['--input', path, '--output', os.devnull,
+                                                  '--window', str(window), '--quiet']
+    start = time.time()
+    process = subprocess.Popen(command, cwd=SRC)
+    pid, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.time() - start
+    if status != 0:
+        raise RuntimeError('%s exited with status %i' % (name, status))
+    return {
+        'seconds': elapsed,
+        'events_per_sec': events / elapsed,
+        'peak_rss_kb': usage.ru_maxrss,
+    }
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+    """Nearest-rank percentiles of samples, plus the max, keyed 'p50' etc."""
+    samples = sorted(samples)
+    result = {}
+    for point in points:
+        # the smallest sample with at least point percent of the samples at or below it
+        index = max(0, int(math.ceil(len(samples) * point / 100.0)) - 1)
+        result['p%s' % ('%g' % point)] = samples[index]
+    result['max'] = samples[-1]
+    return result
+
+
+def measure_latency(name, path, window, limit=None):
+    """Push the stream through a registered engine one event at a time, returning latency percentiles in microseconds."""
+    from mapper import json_to_edge
+    from collector import emit
+
+    engine  = ENGINES[name](window=window)
+    samples = []
+    timer   = time.time
+    try:
+        with open(path, 'r') as stream:
+            for i, raw in enumerate(stream):
+                if limit and i >= limit:
+                    break
+                start = timer()
+                emit(engine.push(json_to_edge(raw)))
+                samples.append((timer() - start) * 1e6)
+    finally:
+        engine.close()
+    return percentiles(samples)
+
+
+def benchmark(path, targets, window, latency_limit=None, engines=DEFAULT_ENGINES):
+    """Benchmark targets, and the latency of engines, over the stream at path, returning a json-able report."""
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    events = count_lines(path)
+    report = {'stream': {'path': path, 'events': events, 'window': window}, 'results': {}}
+    for name in targets:
+        report['results'][name] = run_target(name, path, events, window)
+        print("%s: %.0f events/s, %.2f s, %i KB peak RSS" % (name,
+            report['results'][name]['events_per_sec'], report['results'][name]['seconds'],
+            report['results'][name]['peak_rss_kb']), file=sys.stderr)
+
+    report['latency_us'] = {}
+    for name in engines:
+        report['latency_us'][name] = measure_latency(name, path, window, latency_limit)
+        print("latency %s: %s" % (name, report['latency_us'][name]), file=sys.stderr)
+    return report
+
+
+def regressions(report, baseline, tolerance):
+    """List targets whose throughput fell more than tolerance below the baseline."""
+    failures = []
+    for name, result in report['results'].iteritems():
+        if name not in baseline.get('results', {}):
+            continue
+        expect = baseline['results'][name]['events_per_sec']
+        if result['events_per_sec'] < expect * (1 - tolerance):
+            failures.append('%s: %.0f events/s, baseline %.0f' % (name, result['events_per_sec'], expect))
+    return failures
+
+
+class ArgparseFormatter(argparse.RawDescriptionHelpFormatter, argparse.ArgumentDefaultsHelpFormatter):
+    pass
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                formatter_class=ArgparseFormatter)
+
+    parser.add_argument('-i', '--input', required=True,
+        help="transaction stream, e.g. from generate.py")
+
+    parser.add_argument('-t', '--targets', nargs='+', choices=sorted(TARGETS),
+        default=['median_degree'] + ['engine-%s' % name for name in DEFAULT_ENGINES],
+        help="command-line targets to run")
+
+    parser.add_argument('-e', '--engines', nargs='*', choices=sorted(ENGINES),
+        default=DEFAULT_ENGINES,
+        help="registered engines to measure per-event latency for")
+
+    parser.add_argument('-w', '--window', type=int,
+        default=60,
+        help="sliding window in seconds")
+
+    parser.add_argument('--latency-limit', type=int,
+        help="only time the first N events for latency percentiles")
+
+    parser.add_argument('-o', '--output',
+        help="write the json report to this file, as well as stdout")
+
+    parser.add_argument('--baseline',
+        help="json report to compare throughput against, exits 1 on regression")
+
+    parser.add_argument('--tolerance', type=float,
+        default=0.1,
+        help="allowed fractional throughput drop against the baseline")
+
+    args = parser.parse_args()
+
+    report = benchmark(os.path.abspath(args.input), args.targets, args.window, args.latency_limit, args.engines)
+    print(json.dumps(report, indent=2, sort_keys=True))
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(report, stream, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as stream:
+            failures = regressions(report, json.load(stream), args.tolerance)
+        for failure in failures:
+            print("REGRESSION %s" % failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""Differential test of two median degree engines over the same stream.
+
+Edges come from a file of json transactions, or from generate.py with a seed,
+and are pushed through both engines in batches. The median of every event is
+compared as it would be written out, two decimal places. The first event where
+the engines disagree is reported, with its edge and both medians, and the run
+exits 1. By default the naive engine, the logic of control.py, is the reference.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import argparse
+import logging
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+sys.path.insert(0, SRC)
+
+from generate import generate
+from engines import ENGINES
+from collector import emit
+from mapper import json_to_edge
+
+
+def read_edges(path):
+    with open(path, 'r') as stream:
+        for raw in stream:
+            yield json_to_edge(raw)
+
+
+def synthetic_edges(events, users, seed):
+    for actor, target, timestamp in generate(events, users=users, seed=seed):
+        yield ('user-%i' % actor, 'user-%i' % target, timestamp)
+
+
+def batched(edges, size):
+    batch = []
+    for edge in edges:
+        batch.append(edge)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def compare(edges, left, right, batch_size=1024):
+    """Push edges through both engines, returning the first divergence or None.
+
+    Returns:
+        tuple: event index, edge, left median, right median
+
+    """
+    i = 0
+    for batch in batched(edges, batch_size):
+        for edge, a, b in zip(batch, left.push_many(batch), right.push_many(batch)):
+            if emit(a) != emit(b):
+                return i, edge, emit(a), emit(b)
+            i += 1
+    return None
+
+
+class ArgparseFormatter(argparse.RawDescriptionHelpFormatter, argparse.ArgumentDefaultsHelpFormatter):
+    pass
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                formatter_class=ArgparseFormatter)
+
+    parser.add_argument('-i', '--input',
+        help="transaction stream to replay, otherwise one is generated")
+
+    parser.add_argument('-n', '--events', type=int,
+        default=20000,
+        help="number of events to generate")
+
+    parser.add_argument('-u', '--users', type=int,
+        default=2000,
+        help="number of distinct users to generate")
+
+    parser.add_argument('--seed', type=int,
+        default=1,
+        help="random seed of the generated stream")
+
+    parser.add_argument('--left', choices=sorted(ENGINES),
+        default='naive',
+        help="reference engine")
+
+    parser.add_argument('--right', choices=sorted(ENGINES),
+        default='histogram',
+        help="engine under test")
+
+    parser.add_argument('-w', '--window', type=int,
+        default=60,
+        help="sliding window in seconds")
+
+    parser.add_argument('--step', type=int,
+        default=1,
+        help="seconds per hop of the window's lower-bound")
+
+    parser.add_argument('-b', '--batch-size', type=int,
+        default=1024,
+        help="edges pushed per batch")
+
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    if args.input:
+        edges = read_edges(args.input)
+    else:
+        edges = synthetic_edges(args.events, args.users, args.seed)
+
+    left  = ENGINES[args.left](window=args.window, step=args.step)
+    right = ENGINES[args.right](window=args.window, step=args.step)
+    try:
+        divergence = compare(edges, left, right, args.batch_size)
+    finally:
+        left.close()
+        right.close()
+
+    if divergence is not None:
+        i, edge, a, b = divergence
+        print("diverged at event %i, edge %s: %s=%s %s=%s" % (i, edge, args.left, a, args.right, b))
+        sys.exit(1)
+    print("%s and %s agree" % (args.left, args.right))
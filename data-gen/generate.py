@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""Generate synthetic venmo-style transaction streams of arbitrary size.
+
+Actors and targets are drawn from a power-law (Zipf-like) distribution over
+user ranks, so a few users carry most of the degree. Event time advances at a
+fixed number of events per second; a fraction of events repeat a recent edge,
+and a fraction arrive late, with their time-stamp pushed back.
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+import random
+import argparse
+
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+LINE_FORMAT = '{"created_time": "%s", "target": "%s", "actor": "%s"}\n'
+
+
+def power_law(rand, users, skew):
+    """Draw a user rank in [0, users), P(rank) ~ rank^-skew, by inverse transform."""
+    if skew == 0:
+        return rand.randrange(users)
+    if skew == 1:
+        return min(int(users ** rand.random()) - 1, users - 1)
+    exponent = 1.0 - skew
+    rank = ((users ** exponent - 1) * rand.random() + 1) ** (1.0 / exponent)
+    return min(int(rank) - 1, users - 1)
+
+
+def generate(events, users=100000, skew=1.2, rate=30, duplicates=0.05, late=0.01,
+             lateness=30, start=1459207392, seed=None):
+    """Yield (actor, target, timestamp) edges.
+
+    Args:
+        events (int): number of events
+        users (int): number of distinct users
+        skew (float): power-law exponent of user activity, 0 is uniform
+        rate (float): events per second of event time
+        duplicates (float): fraction of events repeating one of the recent edges
+        late (float): fraction of events arriving late
+        lateness (int): maximum seconds a late event lags behind
+        start (int): unix epoch of the first event
+        seed (int): random seed, for repeatable streams
+
+    """
+    rand = random.Random(seed)
+    recent = []
+    for i in xrange(events):
+        timestamp = start + int(i / rate)
+        if recent and rand.random() < duplicates:
+            actor, target = rand.choice(recent)
+        else:
+            actor = power_law(rand, users, skew)
+            target = power_law(rand, users, skew)
+            while target == actor and users > 1:
+                target = power_law(rand, users, skew)
+            if len(recent) < 1000:
+                recent.append((actor, target))
+            else:
+                recent[rand.randrange(1000)] = (actor, target)
+        if rand.random() < late:
+            timestamp -= rand.randint(1, lateness)
+        yield (actor, target, timestamp)
+
+
+def write_stream(edges, stream):
+    """Write edges as newline-delimited json."""
+    last_timestamp, created = None, None
+    for actor, target, timestamp in edges:
+        if timestamp != last_timestamp:
+            last_timestamp = timestamp
+            created = time.strftime(TIME_FORMAT, time.gmtime(timestamp))
+        stream.write(LINE_FORMAT % (created, 'user-%i' % target, 'user-%i' % actor))
+
+
+class ArgparseFormatter(argparse.RawDescriptionHelpFormatter, argparse.ArgumentDefaultsHelpFormatter):
+    pass
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                formatter_class=ArgparseFormatter)
+
+    parser.add_argument('-n', '--events', type=int, required=True,
+        help="number of events to generate")
+
+    parser.add_argument('-o', '--output',
+        default='-',
+        help="output file, '-' for stdout")
+
+    parser.add_argument('-u', '--users', type=int,
+        default=100000,
+        help="number of distinct users")
+
+    parser.add_argument('-s', '--skew', type=float,
+        default=1.2,
+        help="power-law exponent of user activity, 0 for uniform")
+
+    parser.add_argument('-r', '--rate', type=float,
+        default=30,
+        help="events per second of event time")
+
+    parser.add_argument('-d', '--duplicates', type=float,
+        default=0.05,
+        help="fraction of events repeating a recent edge")
+
+    parser.add_argument('-l', '--late', type=float,
+        default=0.01,
+        help="fraction of events arriving out of order, late")
+
+    parser.add_argument('--lateness', type=int,
+        default=30,
+        help="maximum seconds a late event lags behind")
+
+    parser.add_argument('--start', type=int,
+        default=1459207392,
+        help="unix epoch of the first event")
+
+    parser.add_argument('--seed', type=int,
+        help="random seed, for repeatable streams")
+
+    args = parser.parse_args()
+
+    edges = generate(args.events, users=args.users, skew=args.skew, rate=args.rate,
+                     duplicates=args.duplicates, late=args.late, lateness=args.lateness,
+                     start=args.start, seed=args.seed)
+    if args.output == '-':
+        write_stream(edges, sys.stdout)
+    else:
+        with open(args.output, 'w') as stream:
+            write_stream(edges, stream)
@@ -0,0 +1,197 @@
+"""Checkpoint saves and restores pipeline state in a compact binary file.
+-----
+
+A checkpoint holds everything needed to resume a run without replaying the
+window: the cache's live edges with their latest time-stamps, window lower-bound
+and ring head; the reducer's node degrees; interned names when interning; the
+collector's emission state; and the input and output byte offsets reached.
+
+Layout (little-endian): the 8 byte magic, a u32 length and a json header of
+scalar fields, then sections of `(4 byte name, 1 byte array typecode, u64 byte
+length)` followed by the raw array bytes. Loading memory-maps the file and
+copies each section straight into an `array`, so no per-record parsing happens.
+Node names are stored once, in a string table, and edges refer to them by index.
+
+"""
+
+import os
+import mmap
+import json
+import struct
+import logging as log
+
+from array import array
+from interner import Interner
+
+
+MAGIC = 'MVDCKPT1'
+FILENAME = 'checkpoint.bin'
+_HEADER = struct.Struct('<8sI')
+_SECTION = struct.Struct('<4scQ')
+
+
+def checkpoint_path(directory):
+    return os.path.join(directory, FILENAME)
+
+
+def _strings(names):
+    """Pack a list of names (or None) into length and blob arrays.
+
+    Names are stored as utf-8, or all as json when any is not a string, e.g.
+    integer node ids, so they load back as the same values.
+
+    Returns:
+        tuple(array, array, bool): lengths, blob, and whether it holds json
+
+    """
+    names = list(names)
+    as_json = not all(name is None or isinstance(name, basestring) for name in names)
+    lengths = array('l')
+    blob = []
+    for name in names:
+        if name is None:
+            lengths.append(-1)
+        else:
+            data = json.dumps(name) if as_json else name.encode('utf-8')
+            lengths.append(len(data))
+            blob.append(data)
+    return lengths, array('B', ''.join(blob)), as_json
+
+
+def _unstrings(lengths, blob, as_json=False):
+    """Unpack names packed by _strings."""
+    data = blob.tostring()
+    names = []
+    offset = 0
+    for length in lengths:
+        if length < 0:
+            names.append(None)
+        else:
+            name = data[offset:offset+length]
+            names.append(json.loads(name) if as_json else name.decode('utf-8'))
+            offset += length
+    return names
+
+
+def save(directory, cache, reducer, interner=None, collector=None, **offsets):
+    """Atomically write a checkpoint of the pipeline state into directory.
+
+    Args:
+        offsets: scalar positions to resume from, e.g. input, output and events
+
+    """
+    edges = cache.edges
+    nodes = reducer.nodes
+    sections = []
+
+    if interner is not None:
+        sections.append(('EKEY', array('L', edges.iterkeys())))
+        sections.append(('NKEY', array('L', nodes.iterkeys())))
+        lengths, blob, as_json = _strings(interner.names)
+        sections.append(('FREE', array('L', interner.free)))
+    else:
+        index = dict((node, i) for i, node in enumerate(nodes.iterkeys()))
+        sections.append(('EDGA', array('l', (index[a] for a, b in edges.iterkeys()))))
+        sections.append(('EDGB', array('l', (index[b] for a, b in edges.iterkeys()))))
+        lengths, blob, as_json = _strings(nodes.iterkeys())
+    sections.append(('ETIM', array('l', edges.itervalues())))
+    sections.append(('NDEG', array('l', nodes.itervalues())))
+    sections.append(('STRL', lengths))
+    sections.append(('STRB', blob))
+
+    header = {
+        'window': cache.size,
+        'step': cache.step,
+        'lower_bound': cache.lower_bound,
+        'head': cache.head,
+        'packed': interner is not None,
+        'json_names': as_json,
+        'itemsize': array('l').itemsize,
+        'last': collector.last if collector else None,
+        'frame': collector.frame if collector else None,
+    }
+    header.update(offsets)
+    header = json.dumps(header)
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    path = checkpoint_path(directory)
+    with open(path + '.tmp', 'wb') as stream:
+        stream.write(_HEADER.pack(MAGIC, len(header)))
+        stream.write(header)
+        for name, values in sections:
+            stream.write(_SECTION.pack(name, values.typecode, len(values) * values.itemsize))
+            values.tofile(stream)
+    os.rename(path + '.tmp', path)
+    log.debug("checkpoint: %i edges, %i nodes -> %s", len(edges), len(nodes), path)
+
+
+def load(directory):
+    """Read a checkpoint from directory.
+
+    Returns:
+        tuple(dict, dict): header fields, and arrays by section name
+
+    """
+    with open(checkpoint_path(directory), 'rb') as stream:
+        data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, length = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError('not a checkpoint file: %s' % checkpoint_path(directory))
+        offset = _HEADER.size
+        header = json.loads(data[offset:offset+length])
+        if header['itemsize'] != array('l').itemsize:
+            raise ValueError('checkpoint was written on a platform with a different word size')
+        offset += length
+
+        sections = {}
+        while offset < len(data):
+            name, typecode, size = _SECTION.unpack_from(data, offset)
+            offset += _SECTION.size
+            values = array(typecode)
+            values.fromstring(data[offset:offset+size])
+            sections[name] = values
+            offset += size
+    finally:
+        data.close()
+    return header, sections
+
+
+def restore(header, sections, cache, reducer, collector=None, packed=False):
+    """Load checkpointed state into a fresh cache, reducer and collector.
+
+    Args:
+        packed (bool): the pipeline interns node ids, as the checkpoint must
+
+    Returns:
+        Interner: the restored interner, None when the checkpoint is not interned
+
+    """
+    if header['window'] != cache.size:
+        raise ValueError('checkpoint window %i does not match %i' % (header['window'], cache.size))
+    if header.get('step', 1) != cache.step:
+        raise ValueError('checkpoint step %i does not match %i' % (header.get('step', 1), cache.step))
+    if header['packed'] != packed:
+        raise ValueError('checkpoint interning %s does not match %s, resume with the same --intern' % (
+            header['packed'], packed))
+
+    interner = None
+    names = _unstrings(sections['STRL'], sections['STRB'], header.get('json_names', False))
+    if header['packed']:
+        interner = Interner()
+        interner.names = names
+        interner.ids = dict((name, i) for i, name in enumerate(names) if name is not None)
+        interner.free = list(sections['FREE'])
+        keys  = sections['EKEY']
+        nodes = sections['NKEY']
+    else:
+        keys  = zip((names[i] for i in sections['EDGA']), (names[i] for i in sections['EDGB']))
+        nodes = names
+
+    cache.load(dict(zip(keys, sections['ETIM'])), header['lower_bound'], header['head'])
+    reducer.load(dict(zip(nodes, sections['NDEG'])))
+    if collector is not None:
+        collector.last  = header['last']
+        collector.frame = header['frame']
+    return interner
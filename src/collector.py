@@ -0,0 +1,125 @@
+"""Collector step decides when median values are emitted, formats and writes them."""
+
+import logging as log
+
+
+EMIT_CACHE_SIZE = 4096
+
+
+def _format(value):
+    """Workaround for Python's default rounding behavior"""
+    str_deg = '%.3f' % value
+    integer_deg, sep, decimal_deg = str_deg.partition('.')
+    return '.'.join( [integer_deg, (decimal_deg+'0'*2)[:2]])
+
+
+# Medians of integer degrees are k or k + 0.5, formatted up front for small k
+_emitted = dict((half / 2.0, '%i.%s' % (half >> 1, '50' if half & 1 else '00'))
+                for half in xrange(512))
+
+
+def emit(value):
+    """Format a median to two decimals, truncating, from a table of formatted values."""
+    result = _emitted.get(value)
+    if result is None:
+        result = _format(value)
+        if len(_emitted) < EMIT_CACHE_SIZE:
+            _emitted[value] = result
+    return result
+
+
+def emit_columns(values):
+    """Format a row of medians or statistics, per window, as space separated columns."""
+    return ' '.join([emit_columns(value) if isinstance(value, tuple) else emit(value)
+                     for value in values])
+
+
+def emit_period(value):
+    """Parse an emission cadence, 'event', 'second' or a number of seconds, into seconds (0 per event)."""
+    if value == 'event':
+        return 0
+    if value == 'second':
+        return 1
+    seconds = int(value.rstrip('s'))
+    if seconds < 1:
+        raise ValueError('emission period must be at least one second')
+    return seconds
+
+
+class Collector(object):
+    """Write medians out, either per event or once per period of event time.
+
+    In periodic mode the reducer is only asked for its (lazily computed) median
+    when an event crosses into a new period, and once more on close. Each line
+    is then prefixed with the start of its period, `frame * period`, so periods
+    skipped by gaps in the stream, or by `changes_only`, are told apart.
+
+    Args:
+        outfile (file): output stream
+        period (int): seconds of event time between emissions, 0 emits per event
+        changes_only (bool): suppress emissions equal to the previous one
+        buffer (int): lines held before a bulk write, 0 writes each line; see flush
+        columns (bool): values are tuples, of windows or statistics, written as space separated columns
+
+    """
+
+    def __init__(self, outfile, period=0, changes_only=False, buffer=0, columns=False):
+        self.outfile = outfile
+        self.format = emit_columns if columns else emit
+        self.period = period
+        self.changes_only = changes_only
+        self.buffer = buffer
+        self.last = None # last emitted value
+        self.emitted = 0
+        self.frame = None # current period of event time
+        self._pending = []
+
+
+    def collect(self, value, start=None):
+        """Format and write a median, after its period start if given, returning the line or None if suppressed."""
+        result = self.format(value)
+        if self.changes_only and result == self.last:
+            return None
+        self.last = result
+        self.emitted += 1
+        if start is not None:
+            result = '%i %s' % (start, result)
+        if self.buffer:
+            self._pending.append(result)
+            if len(self._pending) >= self.buffer:
+                self.flush()
+        else:
+            self.outfile.write(result + '\n')
+        return result
+
+
+    def flush(self):
+        """Write buffered lines to the output in one call."""
+        if self._pending:
+            self._pending.append('')
+            self.outfile.write('\n'.join(self._pending))
+            del self._pending[:]
+
+
+    def observe(self, timestamp, reducer):
+        """Register an event time, emitting the reducer's median when it starts a new period.
+
+        Must be called before the event's changes are applied, so the emission
+        reflects the closing period. Late events never move the period back.
+
+        """
+        frame = timestamp // self.period
+        if self.frame is None:
+            self.frame = frame
+        elif frame > self.frame:
+            result = self.collect(reducer.current(), self.frame * self.period)
+            self.frame = frame
+            log.debug("output (median degree): r= %s", result)
+
+
+    def close(self, reducer):
+        """Emit the median of the final, open, period, and flush buffered lines."""
+        if self.period and self.frame is not None:
+            result = self.collect(reducer.current(), self.frame * self.period)
+            log.debug("output (median degree): r= %s", result)
+        self.flush()
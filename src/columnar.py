@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""Columnar is a compact binary edge format, converted once from json transactions.
+-----
+
+Reruns over the same input, e.g. backfills, spend most of their time parsing
+json. Converting the input once stores the edges already mapped and interned:
+actor ids, target ids and time-stamps, each as one contiguous column.
+
+Layout (native byte order): the 8 byte magic, a u32 length and a json header,
+padded to 8 bytes, then the actor and target ids as int32 `array('i')` and the
+time-stamps as int64 `array('l')`, each column padded to 8 bytes. The node
+names, indexed by id, are kept next to it in a json sidecar, `<path>.names`.
+
+`ColumnarReader` memory-maps the file and slices whole batches of the columns
+into typed arrays, with no parsing or per-event string objects. Run as a
+script to convert an input file.
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import argparse
+
+from array import array
+from itertools import izip
+from mapper import json_to_edge
+from interner import Interner
+
+
+MAGIC = 'MVDCOL01'
+SUFFIX = '.names'
+ALIGN = 8
+_HEADER = struct.Struct('<8sI')
+
+
+def names_path(path):
+    return path + SUFFIX
+
+
+def _padding(size):
+    return -size % ALIGN
+
+
+def convert(source, path):
+    """Map and intern the json transactions of source, writing them as a columnar file.
+
+    Returns:
+        int: number of edges written
+
+    """
+    interner = Interner()
+    actors, targets, timestamps = array('i'), array('i'), array('l')
+    with open(source, 'rb') as stream:
+        for raw in stream:
+            actor, target, timestamp = interner.intern_edge(json_to_edge(raw))
+            actors.append(actor)
+            targets.append(target)
+            timestamps.append(timestamp)
+    write(path, actors, targets, timestamps, interner.names)
+    return len(timestamps)
+
+
+def write(path, actors, targets, timestamps, names):
+    """Write edge columns and their node names."""
+    if timestamps.itemsize != 8 or actors.itemsize != 4:
+        raise ValueError('columns need int32 ids and int64 time-stamps')
+    header = json.dumps({'count': len(timestamps)})
+    header += ' ' * _padding(_HEADER.size + len(header))
+    with open(path + '.tmp', 'wb') as stream:
+        stream.write(_HEADER.pack(MAGIC, len(header)))
+        stream.write(header)
+        for column in (actors, targets, timestamps):
+            column.tofile(stream)
+            stream.write('\0' * _padding(len(column) * column.itemsize))
+    with open(names_path(path), 'w') as stream:
+        json.dump(names, stream)
+    os.rename(path + '.tmp', path)
+
+
+class ColumnarReader(object):
+    """Memory-mapped columnar file, read in slices of whole columns.
+
+    Args:
+        path (str): columnar file, from `convert`
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as stream:
+            self._data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, length = _HEADER.unpack(self._data[:_HEADER.size])
+        if magic != MAGIC:
+            raise ValueError('not a columnar edge file: %s' % path)
+        header = json.loads(self._data[_HEADER.size:_HEADER.size + length])
+        self.count = header['count']
+        start = _HEADER.size + length
+        self._offsets = []
+        for itemsize in (4, 4, 8):
+            self._offsets.append((start, itemsize))
+            start += self.count * itemsize + _padding(self.count * itemsize)
+        self._names = None
+
+
+    def __len__(self):
+        return self.count
+
+
+    @property
+    def names(self):
+        """Node names indexed by id, loaded on first use."""
+        if self._names is None:
+            with open(names_path(self.path), 'r') as stream:
+                self._names = json.load(stream)
+        return self._names
+
+
+    def columns(self, start=0, stop=None):
+        """Slice edges start to stop into actor, target and time-stamp arrays."""
+        stop = self.count if stop is None else min(stop, self.count)
+        columns = []
+        for (offset, itemsize), typecode in izip(self._offsets, 'iil'):
+            column = array(typecode)
+            column.fromstring(self._data[offset + start * itemsize:offset + stop * itemsize])
+            columns.append(column)
+        return tuple(columns)
+
+
+    def batches(self, size):
+        """Yield the edges in batches of at most size, as lists of (actor, target, timestamp)."""
+        for start in xrange(0, self.count, size):
+            yield zip(*self.columns(start, start + size))
+
+
+    def close(self):
+        self._data.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-i', '--input', required=True,
+        help="file containing json transactions")
+
+    parser.add_argument('-o', '--output', required=True,
+        help="columnar file to write, node names go to OUTPUT.names")
+
+    args = parser.parse_args()
+    start = time.time()
+    count = convert(args.input, args.output)
+    print("%i edges, %i bytes, %.2f s" % (count, os.path.getsize(args.output), time.time() - start),
+          file=sys.stderr)
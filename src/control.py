@@ -8,8 +8,8 @@ import argparse
 import logging as log
 import coloredlogs
 
-from collections import defaultdict
 from mapper import json_to_edge
+from engines import NaiveEngine
 
 
 LOGGING = {
@@ -21,13 +21,6 @@ LOGGING = {
 }
 
 
-def lexed_key(a,b):
-    """Lexicographically sort nodes in an edge and return a tuple key"""
-    if a < b:
-        return (a,b)
-    else:
-        return (b,a)
-
 def emit(value):
     """Workaround for Python's default rounding behavior"""
     str_deg = '%.3f' % value
@@ -37,65 +30,23 @@ def emit(value):
 
 def main(args):
 
-    lower_bound = 0    
-    edges = {}    
+    engine = NaiveEngine(window=args.window, step=args.step)
 
     with open(args.input, 'r') as trans, open(args.output, 'w') as outfile:
-        for i, raw in enumerate(trans): 
+        for i, raw in enumerate(trans):
             ## Ingest, as raw "events" from file stream
-            log.debug("raw:%i: %s" % (i, raw.rstrip()))     
-            
-            ## Map, raw to tuple/edge representation 
-            a, b, timestamp = json_to_edge(raw)
-            key = lexed_key(a,b)
-            delta = timestamp - lower_bound
-
-            ## Reduce edges
-            if delta >= 0: # within window
-                if delta >= args.window: # ahead of window
-                    lower_bound = timestamp - args.window + 1
-                    for edge in edges.keys():                        
-                        if edges[edge] < lower_bound:
-                            del edges[edge]                
-
-                # observe current edge
-                try:
-                    # touch ttl                
-                    if timestamp > edges[key]:
-                        edges[key] = timestamp
-                except KeyError:
-                    # add edge
-                    edges[key] = timestamp
-
-            ## Reduce nodes
-            nodes = defaultdict(int)
-            for edge in edges.keys():
-                a, b = edge
-                nodes[a] += 1
-                nodes[b] += 1
-
-            # determine degree distribution
-            dist = nodes.values()            
-            dist.sort()
-            log.debug("dist(%i): %s" % (len(dist), dist))
-
-            # find median
-            length = len(dist)
-            if length % 2 == 0:
-                idx = (length / 2) - 1
-                median = sum(d for d in dist[idx:idx+2]) / 2.0
-            else: 
-                idx = (length - 1) / 2
-                median = dist[idx]
-            
-            
-            ## Collect, output                   
-            log.info("output (median degree): %f" % median)
-            print(emit(median), file=outfile)         
-            
-            log.debug("\n----------\n")  
-
-           
+            log.debug("raw:%i: %s", i, raw.rstrip())
+
+            ## Map, raw to tuple/edge representation, then Reduce edges and nodes
+            median = engine.push(json_to_edge(raw))
+
+            ## Collect, output
+            log.info("output (median degree): %f", median)
+            print(emit(median), file=outfile)
+
+            log.debug("\n----------\n")
+
+
 
 # --------------------------------------------------------------------
 class ArgparseFormatter(argparse.RawDescriptionHelpFormatter, argparse.ArgumentDefaultsHelpFormatter):
@@ -120,10 +71,9 @@ if __name__ == '__main__':
         default=60,
         help="sliding window (lagging) in seconds")
 
-    # NOT IMPLEMENTED
-    # parser.add_argument('-s', '--step', type=int,
-    #     default=1,
-    #     help="increment window in steps of size STEP")
+    parser.add_argument('-s', '--step', type=int,
+        default=1,
+        help="increment window in steps of size STEP")
 
     parser.add_argument('-d', '--debug', dest='log_lvl', nargs='?', 
         const='DEBUG',
@@ -140,6 +90,9 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
 
+    if not 1 <= args.step <= args.window:
+        parser.error("--step must be within 1 and the --window")
+
     import logging.config
     logging.config.dictConfig(LOGGING)
     coloredlogs.install(level=args.log_lvl)
@@ -0,0 +1,168 @@
+"""DegreeHistogram is a count-based degree distribution with order-statistic cursors.
+-----
+
+Node degrees are small non-negative integers which only move by small steps, so
+the distribution is kept as a list of counts indexed by degree, `counts[d]` being
+the number of nodes with degree `d`. Order statistics (the median, for one) are
+tracked by cursors that remember a degree and the number of nodes below it. When
+a node moves between degrees each cursor is patched in O(1), and a query walks
+the cursor only as far as the distribution actually moved -- O(1) amortized.
+
+Any quantile gets its own pair of cursors, created on first query, and the sum
+and maximum of degrees are kept up to date on each move, so the mean and max are
+O(1) as well.
+
+"""
+
+
+class Cursor(object):
+    """Position within the histogram, tracks `degree` and the count of nodes `below` it."""
+
+    def __init__(self):
+        self.degree = 1
+        self.below = 0
+
+
+    def move(self, old, new):
+        """Patch the cursor for a node moving from degree `old` to `new`, 0 is absent."""
+        if 0 < old < self.degree:
+            self.below -= 1
+        if 0 < new < self.degree:
+            self.below += 1
+
+
+    def select(self, counts, k):
+        """Walk to the degree of the k-th (0-based) smallest node."""
+        degree, below = self.degree, self.below
+        while k < below:
+            degree -= 1
+            below -= counts[degree]
+        while k >= below + counts[degree]:
+            below += counts[degree]
+            degree += 1
+        self.degree, self.below = degree, below
+        return degree
+
+
+class DegreeHistogram(object):
+    """Maintain a node degree distribution, supporting O(1) amortized median queries."""
+
+    def __init__(self):
+        self.counts = [0, 0] # index: degree, value: number of nodes
+        self.total = 0
+        self.degrees = 0 # sum of degrees
+        self.max = 0
+        self._lower = Cursor()
+        self._upper = Cursor()
+        self._cursors = [self._lower, self._upper]
+        self._quantiles = {} # q: (lower, upper) cursors
+
+
+    def __len__(self):
+        return self.total
+
+
+    def __iter__(self):
+        """Iterate degrees in sorted order, like the sortedlist it stands in for."""
+        for degree, count in enumerate(self.counts):
+            for i in xrange(count):
+                yield degree
+
+
+    def __repr__(self):
+        return repr(dict((d, c) for d, c in enumerate(self.counts) if c))
+
+
+    def move(self, old, new):
+        """Move one node from degree `old` to degree `new`, where degree 0 is absent."""
+        if old == new:
+            return
+        counts = self.counts
+        if old:
+            counts[old] -= 1
+            self.total -= 1
+        if new:
+            if new >= len(counts):
+                counts.extend([0] * (new - len(counts) + 1))
+            counts[new] += 1
+            self.total += 1
+            if new > self.max:
+                self.max = new
+        self.degrees += new - old
+        if old == self.max and not counts[old]:
+            while self.max and not counts[self.max]:
+                self.max -= 1
+        for cursor in self._cursors:
+            cursor.move(old, new)
+
+
+    def merge(self, deltas, start=0, stop=None):
+        """Add count deltas, flat `(degree, delta)` pairs from start to stop, e.g. from another histogram."""
+        counts = self.counts
+        cursors = self._cursors
+        top = self.max
+        total = degrees = 0
+        for i in xrange(start, len(deltas) if stop is None else stop, 2):
+            degree = deltas[i]
+            delta = deltas[i+1]
+            if degree >= len(counts):
+                counts.extend([0] * (degree - len(counts) + 1))
+            counts[degree] += delta
+            total += delta
+            degrees += degree * delta
+            if degree > top and delta > 0:
+                top = degree
+            for cursor in cursors:
+                if degree < cursor.degree:
+                    cursor.below += delta
+        while top and not counts[top]:
+            top -= 1
+        self.max = top
+        self.total += total
+        self.degrees += degrees
+
+
+    def median(self):
+        """Retrieve median degree, averaging the middle pair on even length."""
+        length = self.total
+        if length == 0:
+            return 0.0
+        if length % 2 == 0: # even
+            index = (length // 2) - 1
+            lower = self._lower.select(self.counts, index)
+            upper = self._upper.select(self.counts, index + 1)
+            return (lower + upper) / 2.0
+        else: # odd
+            index = (length - 1) // 2
+            return self._lower.select(self.counts, index)
+
+
+    def quantile(self, q):
+        """Retrieve the q-th quantile degree, interpolating linearly between ranks.
+
+        The 0.5 quantile is the median.
+
+        """
+        length = self.total
+        if length == 0:
+            return 0.0
+        try:
+            lower, upper = self._quantiles[q]
+        except KeyError:
+            lower, upper = self._quantiles[q] = (Cursor(), Cursor())
+            self._cursors.extend((lower, upper))
+        position = q * (length - 1)
+        index = int(position)
+        fraction = position - index
+        low = lower.select(self.counts, index)
+        if not fraction:
+            return float(low)
+        high = upper.select(self.counts, index + 1)
+        return low + (high - low) * fraction
+
+
+    def mean(self):
+        """Retrieve the mean degree."""
+        if self.total == 0:
+            return 0.0
+        return self.degrees / float(self.total)
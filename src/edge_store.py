@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+"""EdgeStore is a compact open-addressing edge table backed by typed arrays.
+-----
+
+The default cache keeps live edges in a dict, with more references in one
+Python set per bucket, costing well over a hundred bytes per edge. With interned
+nodes, an edge key is a single packed integer, so edges can live in flat arrays.
+
+Entries are kept in a dense arena of parallel arrays: the packed key, latest
+time-stamp, and `prev` / `next` links. The links chain each entry into the
+bucket list of its latest time-stamp, so bucket membership is a pair of array
+indices and moving an edge between buckets is O(1). Freed entries are reused
+through a free list threaded on `next`.
+
+Keys are found through an index table of entry numbers, with linear probing.
+Deleted slots are left as tombstones, so probe chains stay intact. When live
+and tombstoned slots pass 2/3 of the table, a new table is allocated. Slots are
+moved across a few at a time on each following operation, so no single update
+pays for the whole resize. Until then, lookups try the new table, then the old.
+
+`ArrayCache` is a drop-in `Cache` for packed keys using this store, with the
+same diffs. Run as a script to compare bytes per edge against the dict and set
+layout.
+
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+import random
+import argparse
+
+from array import array
+from edge_time_cache import Cache, hop
+from stats import NULL_STATS
+
+
+EMPTY = -1
+TOMBSTONE = -2
+MIN_TABLE = 8
+RESIZE_STEP = 16 # old table slots migrated per operation while resizing
+GOLDEN = 0x9E3779B97F4A7C15 # 2^64 / phi, odd
+MASK64 = (1 << 64) - 1
+
+
+def _table(size):
+    return array('i', [EMPTY]) * size
+
+
+def _home(key, size):
+    """Fibonacci hash a packed key to a slot of a power of two table.
+
+    Packed keys of dense ids differ mostly in their low bits, so the top bits
+    of the key times GOLDEN are taken rather than the key modulo the size.
+
+    """
+    return ((key * GOLDEN) & MASK64) >> (65 - size.bit_length())
+
+
+class EdgeStore(object):
+    """Map packed edge keys to their latest time-stamps in typed arrays.
+
+    Behaves as a read-only dict for inspection (len, in, get, iteration), while
+    updates go through the entry-level `find`, `insert` and `remove`.
+
+    """
+
+    def __init__(self):
+        self.keys  = array('L')
+        self.times = array('l')
+        self.prev  = array('i')
+        self.next  = array('i')
+        self._free = EMPTY # head of the free entry list, chained on next
+        self._length = 0
+        self._index = _table(MIN_TABLE)
+        self._used  = 0 # live and tombstoned slots in _index
+        self._old   = None # table being migrated from
+        self._moved = 0 # slots of _old migrated so far
+
+
+    def __len__(self):
+        return self._length
+
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+
+    def __getitem__(self, key):
+        entry = self.find(key)
+        if entry < 0:
+            raise KeyError(key)
+        return self.times[entry]
+
+
+    def get(self, key, default=None):
+        entry = self.find(key)
+        return self.times[entry] if entry >= 0 else default
+
+
+    def entries(self):
+        """Iterate live entry numbers, across both tables while resizing."""
+        for table in (self._index, self._old):
+            if table is not None:
+                for entry in table:
+                    if entry >= 0:
+                        yield entry
+
+
+    def iteritems(self):
+        keys, times = self.keys, self.times
+        return ((keys[entry], times[entry]) for entry in self.entries())
+
+
+    def iterkeys(self):
+        keys = self.keys
+        return (keys[entry] for entry in self.entries())
+
+
+    def itervalues(self):
+        times = self.times
+        return (times[entry] for entry in self.entries())
+
+
+    __iter__ = iterkeys
+
+
+    def _probe(self, table, key):
+        """Find the slot holding key in table, or -1."""
+        mask = len(table) - 1
+        keys = self.keys
+        slot = _home(key, len(table))
+        while True:
+            entry = table[slot]
+            if entry == EMPTY:
+                return -1
+            if entry >= 0 and keys[entry] == key:
+                return slot
+            slot = (slot + 1) & mask
+
+
+    def _place(self, table, key, entry):
+        """Store entry in the first free slot of key's probe chain, returning whether it was empty."""
+        mask = len(table) - 1
+        slot = _home(key, len(table))
+        while table[slot] >= 0:
+            slot = (slot + 1) & mask
+        empty = table[slot] == EMPTY
+        table[slot] = entry
+        return empty
+
+
+    def _migrate(self, count):
+        """Move up to count slots of the old table into the current one."""
+        old, keys = self._old, self.keys
+        end = min(len(old), self._moved + count)
+        for slot in xrange(self._moved, end):
+            entry = old[slot]
+            if entry >= 0:
+                if self._place(self._index, keys[entry], entry):
+                    self._used += 1
+                old[slot] = TOMBSTONE
+        self._moved = end
+        if end == len(old):
+            self._old = None
+
+
+    def _resize(self):
+        """Start migrating into a table sized for a third of it to be live."""
+        if self._old is not None:
+            self._migrate(len(self._old))
+        size = MIN_TABLE
+        while size < 3 * self._length:
+            size *= 2
+        self._old = self._index
+        self._moved = 0
+        self._index = _table(size)
+        self._used = 0
+
+
+    def find(self, key):
+        """Retrieve key's entry number, or -1 if absent."""
+        if self._old is not None:
+            self._migrate(RESIZE_STEP)
+        slot = self._probe(self._index, key)
+        if slot >= 0:
+            return self._index[slot]
+        if self._old is not None:
+            slot = self._probe(self._old, key)
+            if slot >= 0:
+                return self._old[slot]
+        return -1
+
+
+    def insert(self, key, timestamp):
+        """Add an absent key, returning its entry number, unlinked from any bucket."""
+        if self._free != EMPTY:
+            entry = self._free
+            self._free = self.next[entry]
+            self.keys[entry] = key
+            self.times[entry] = timestamp
+        else:
+            entry = len(self.keys)
+            self.keys.append(key)
+            self.times.append(timestamp)
+            self.prev.append(EMPTY)
+            self.next.append(EMPTY)
+        if self._place(self._index, key, entry):
+            self._used += 1
+        self._length += 1
+        if 3 * self._used > 2 * len(self._index):
+            self._resize()
+        return entry
+
+
+    def remove(self, entry):
+        """Delete an entry, leaving a tombstone in the index and freeing the entry for reuse."""
+        key = self.keys[entry]
+        for table in (self._index, self._old):
+            if table is not None:
+                slot = self._probe(table, key)
+                if slot >= 0:
+                    table[slot] = TOMBSTONE
+                    break
+        self.next[entry] = self._free
+        self._free = entry
+        self._length -= 1
+
+
+    def clear(self):
+        self.__init__()
+
+
+    def nbytes(self):
+        """Bytes held by the arrays."""
+        arrays = [self.keys, self.times, self.prev, self.next, self._index]
+        if self._old is not None:
+            arrays.append(self._old)
+        return sum(values.buffer_info()[1] * values.itemsize for values in arrays)
+
+
+class ArrayCache(Cache):
+    """Cache for packed edge keys, keeping edges in an EdgeStore.
+
+    Each edge is linked only into the bucket of its latest time-stamp, the one
+    which evicts it, so every edge in an expired bucket is evicted. The diffs
+    are the same as `Cache(packed=True)`.
+
+    Args:
+        size (int): window length in seconds
+        step (int): seconds per hop of the lower-bound, and per bucket
+        stats (Stats): instrumentation, times evictions and counts window advances
+
+    """
+
+    def __init__(self, size=60, step=1, stats=NULL_STATS, **kwargs):
+        Cache.__init__(self, size=size, step=step, packed=True, stats=stats)
+        self._rolling_window = _table(self._buckets) # bucket: first entry, chained on EdgeStore.next
+        self._edges = EdgeStore()
+
+
+    def load(self, edges, lower_bound, head=0):
+        """Replace the cache contents with live edges, e.g. from a checkpoint."""
+        self._lower_bound = lower_bound
+        self._head = head % self._buckets
+        self._rolling_window = _table(self._buckets)
+        self._edges = EdgeStore()
+        for key, timestamp in edges.iteritems():
+            self.observe_edge(timestamp - lower_bound, key, timestamp)
+
+
+    def link(self, entry, position):
+        """Push entry onto the front of a bucket list, its prev holding ~position while first."""
+        store, window = self._edges, self._rolling_window
+        first = window[position]
+        store.prev[entry] = ~position
+        store.next[entry] = first
+        if first != EMPTY:
+            store.prev[first] = entry
+        window[position] = entry
+
+
+    def unlink(self, entry):
+        store = self._edges
+        prev, next = store.prev[entry], store.next[entry]
+        if prev >= 0:
+            store.next[prev] = next
+        else:
+            self._rolling_window[~prev] = next
+        if next != EMPTY:
+            store.prev[next] = prev
+
+
+    def truncate(self, index):
+        """Roll trailing buckets, less than index, off the end of the cache.
+
+        Returns:
+            list: entry numbers held by the expired buckets
+
+        """
+        size   = self._buckets
+        window = self._rolling_window
+        links  = self._edges.next
+        head   = self._head
+        expired = []
+        for i in xrange(min(index, size)):
+            position = (head + i) % size
+            entry = window[position]
+            while entry != EMPTY:
+                expired.append(entry)
+                entry = links[entry]
+            window[position] = EMPTY
+        self._head = (head + index) % size
+        return expired
+
+
+    def evict_expired(self, delta):
+        """Evict the edges of expired buckets, all of which are behind the new lower_bound."""
+        index = hop(delta - self.size + 1, self._step) // self._step
+        store = self._edges
+        keys  = store.keys
+        evicted = {}
+        for entry in self.truncate(index):
+            evicted[keys[entry]] = -1
+            store.remove(entry)
+        return evicted
+
+
+    def observe_edge(self, bucket, key, timestamp):
+        """Apply operations to incoming edge."""
+        store    = self._edges
+        position = (self._head + bucket // self._step) % self._buckets
+        entry    = store.find(key)
+        if entry < 0:
+            self.link(store.insert(key, timestamp), position)
+            return {key: 1}
+        if timestamp > store.times[entry]:
+            store.times[entry] = timestamp
+            self.unlink(entry)
+            self.link(entry, position)
+        return {}
+
+
+    def evict_into(self, delta, sink):
+        """Evict the edges of expired buckets, calling sink.edge_removed for each, returning the count."""
+        index = hop(delta - self.size + 1, self._step) // self._step
+        store = self._edges
+        keys  = store.keys
+        expired = self.truncate(index)
+        for entry in expired:
+            key = keys[entry]
+            store.remove(entry)
+            sink.edge_removed(key)
+        return len(expired)
+
+
+    def observe_into(self, bucket, key, timestamp, sink):
+        """Apply an incoming edge, calling sink.edge_added if it is new to the window."""
+        store = self._edges
+        entry = store.find(key)
+        if entry < 0:
+            position = (self._head + bucket // self._step) % self._buckets
+            self.link(store.insert(key, timestamp), position)
+            sink.edge_added(key)
+        elif timestamp > store.times[entry]:
+            position = (self._head + bucket // self._step) % self._buckets
+            store.times[entry] = timestamp
+            self.unlink(entry)
+            self.link(entry, position)
+
+
+def dict_bytes(cache):
+    """Approximate bytes held by a dict and set Cache: the dict, key objects and bucket sets."""
+    size = sys.getsizeof(cache.edges)
+    size += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in cache.edges.iteritems())
+    size += sum(sys.getsizeof(bucket) for bucket in cache.cache)
+    return size
+
+
+def benchmark(edges, nodes, window):
+    """Fill both layouts with random packed edges, returning bytes per edge and seconds for each."""
+    rand = random.Random(1)
+    stream = []
+    for i in xrange(edges):
+        a, b = rand.randrange(nodes), rand.randrange(nodes)
+        stream.append((a, b, 1459207392 + i * window // edges))
+
+    results = {}
+    for name, cache in [('dict', Cache(size=window, packed=True)), ('array', ArrayCache(size=window))]:
+        start = time.time()
+        for edge in stream:
+            cache.update(edge)
+        elapsed = time.time() - start
+        live = len(cache.edges)
+        if name == 'array':
+            held = cache.edges.nbytes() + cache.cache.buffer_info()[1] * cache.cache.itemsize
+        else:
+            held = dict_bytes(cache)
+        results[name] = (held / float(live), elapsed)
+        print("%s: %i live edges, %.1f bytes/edge, %.3f s" % (name, live, results[name][0], elapsed))
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-n', '--edges', type=int,
+        default=1000000,
+        help="edges to insert, all within the window")
+
+    parser.add_argument('-u', '--nodes', type=int,
+        default=1000000,
+        help="distinct node ids")
+
+    parser.add_argument('-w', '--window', type=int,
+        default=60,
+        help="sliding window in seconds")
+
+    args = parser.parse_args()
+    benchmark(args.edges, args.nodes, args.window)
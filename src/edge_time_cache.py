@@ -9,31 +9,78 @@ eviction of all trailing buckets greater than the updated lower-bound delta, cur
 records within the window touch the hash-key within an existing bucket, and old 
 records behind the window do nothing (emitting an empty "diff list").
 
+The buckets form a ring buffer with a moving head, the bucket for a delta being
+`(head + delta) % size`. Advancing the window clears the expired bucket sets in
+place and moves the head, so no buckets are shifted or re-allocated. Optionally
+a second level of the timing wheel counts occupied buckets per slot of `wheel`
+buckets, and a bitmap of the occupied slots lets eviction jump straight to the
+next occupied slot. An advance then visits only the slots holding edges, plus
+a few word-parallel shifts of the bitmap, however long the window or the gap.
+
+With a `step` above 1 the window hops: the lower-bound only moves in multiples
+of `step` seconds, and each bucket is `step` seconds wide, so eviction happens
+in coarse batches over fewer buckets. A step of 1 is the sliding window.
+
+Besides the diffs returned by `update`, the cache can report changes through
+callbacks: `push` calls `sink.edge_added(key)` and `sink.edge_removed(key)` as
+edges enter and leave the window, e.g. on the reducer. Nothing is allocated
+per event, and a duplicate edge within the window only touches its time-stamp.
+
 """
 
 import logging as log
-from itertools import chain
 from collections import defaultdict
+from interner import pack_edge
+from stats import NULL_STATS
+
+def hop(lower_bound, step):
+    """Round a lower-bound up to a multiple of step."""
+    return -(-lower_bound // step) * step
+
+
+def check_step(size, step):
+    """Reject a step outside 1 to the window size, a longer hop would skip past the event advancing it."""
+    if not 1 <= step <= size:
+        raise ValueError('step %i must be within 1 and the window size %i' % (step, size))
+
 
 class Cache(object):
     """Mange the addition and eviction of graph edges from the EdgeTimeCache.
 
     Args:
-        size (int): number of buckets to allocate in cache window
+        size (int): window length in seconds
+        step (int): seconds per hop of the lower-bound, and per bucket
+        wheel (int): buckets per slot in the timing wheel's second level, 0 disables
+        packed (bool): edges carry interned integer node ids, key them as packed integers
+        stats (Stats): instrumentation, times evictions and counts window advances
 
     """
 
-    def __init__(self, size=60, **kwargs):
+    def __init__(self, size=60, step=1, wheel=0, packed=False, stats=NULL_STATS, **kwargs):
+        check_step(size, step)
         self._lower_bound = 0 #time-stamp
         self._size = size       
-        self._rolling_window = list([set() for i in xrange(size)])
+        self._step = step
+        self._buckets = -(-size // step)
+        self._head = 0 # ring index of delta 0
+        self._rolling_window = list([set() for i in xrange(self._buckets)])
         self._edges = {} # key: int bucket_number
+        self._wheel = wheel
+        self._occupied = [0] * (-(-self._buckets // wheel)) if wheel else None # slot: non-empty buckets
+        self._slots = 0 # bitmap of slots with non-empty buckets
+        if packed:
+            self.lexed_key = pack_edge
+        self.stats = stats
 
 
     @property
     def size(self):
         return self._size
 
+    @property
+    def step(self):
+        return self._step
+
     @property 
     def cache(self):
         return self._rolling_window
@@ -42,14 +89,42 @@ class Cache(object):
     def edges(self):
         return self._edges
 
+    @property
+    def head(self):
+        return self._head
+
     @property
     def lower_bound(self):
         return self._lower_bound
 
     def update_lower_bound(self, timestamp):
         """Advance window forward."""
-        self._lower_bound = timestamp - self.size + 1 # +1 shifts to the next "exclusive" frame
-        log.debug("lower_bound-> %i-%i: %i" % (timestamp, self.size, self._lower_bound))
+        self._lower_bound = hop(timestamp - self.size + 1, self._step) # +1 shifts to the next "exclusive" frame
+        log.debug("lower_bound-> %i-%i: %i", timestamp, self.size, self._lower_bound)
+
+
+    def load(self, edges, lower_bound, head=0):
+        """Replace the cache contents with live edges, e.g. from a checkpoint.
+
+        Each edge is placed in the bucket of its latest time-stamp, the only one
+        which can evict it.
+
+        Args:
+            edges dict(key, int): live edges and their latest time-stamps
+            lower_bound (int): window lower-bound time-stamp
+            head (int): ring index of delta 0
+
+        """
+        self._lower_bound = lower_bound
+        self._head = head % self._buckets
+        for bucket in self.cache:
+            bucket.clear()
+        if self._wheel:
+            self._occupied = [0] * len(self._occupied)
+            self._slots = 0
+        self._edges = {}
+        for key, timestamp in edges.iteritems():
+            self.observe_edge(timestamp - lower_bound, key, timestamp)
 
 
     @staticmethod
@@ -72,7 +147,7 @@ class Cache(object):
     def delta(self, timestamp): 
         """Find location winint the time window."""       
         delta = timestamp - self.lower_bound
-        log.debug("delta-> %i-%i: %i" % (timestamp, self.lower_bound, delta))
+        log.debug("delta-> %i-%i: %i", timestamp, self.lower_bound, delta)
         return  delta
 
 
@@ -84,19 +159,46 @@ class Cache(object):
                 is the time-stamp in unix epoch.
 
         """
+        return self.fold(edge, defaultdict(int))
+
+
+    def update_many(self, edges, net=False):
+        """Update the cache with a batch of edge observations.
+
+        Args:
+            edges iterable(tuple(str, str, int)): pre-parsed edges, in event order
+            net (bool): fold the whole batch into one net diff
+
+        Returns:
+            list: one diff per edge, or with `net` a single diff where additions
+                and evictions of the same edge cancel out
+
+        """
+        if net:
+            diff = defaultdict(int)
+            for edge in edges:
+                self.fold(edge, diff)
+            return diff
+        return [self.fold(edge, defaultdict(int)) for edge in edges]
+
+
+    def fold(self, edge, diff):
+        """Apply an edge observation to the cache, summing its changes into diff."""
         (a, b, timestamp) = edge
         key   = self.lexed_key(a, b)
         delta = self.delta(timestamp)
         
-        diff = defaultdict(int)
         # Within window
         if delta >= 0:
             # New, ahead of window, trigger cache eviction
             if delta >= self.size:                 
                 self.update_lower_bound(timestamp)
-                evicted = self.evict_expired(delta)                
+                with self.stats.stage('evict'):
+                    evicted = self.evict_expired(delta)                
                 delta   = self.delta(timestamp)                
-                diff.update(evicted)
+                diff    = self.dict_sum(diff, evicted)
+                self.stats.count('window_advances')
+                self.stats.count('evicted_edges', len(evicted))
             
             # Current, add edge to cache
             new  = self.observe_edge(delta, key, timestamp)
@@ -107,20 +209,113 @@ class Cache(object):
         return diff
 
 
+    def push(self, edge, sink):
+        """Update the cache with an edge observation, calling sink with each edge entering or leaving the window.
+
+        Args:
+            edge tuple(str, str, int): pre-parsed edge, where the 3rd parameter
+                is the time-stamp in unix epoch.
+            sink: receives `edge_added(key)` and `edge_removed(key)`, e.g. a Reducer
+
+        """
+        (a, b, timestamp) = edge
+        delta = timestamp - self._lower_bound
+
+        # Old, behind window, do nothing
+        if delta < 0:
+            return
+
+        # New, ahead of window, trigger cache eviction
+        if delta >= self._size:
+            self.update_lower_bound(timestamp)
+            with self.stats.stage('evict'):
+                evicted = self.evict_into(delta, sink)
+            delta = timestamp - self._lower_bound
+            self.stats.count('window_advances')
+            self.stats.count('evicted_edges', evicted)
+
+        # Current, add edge to cache
+        self.observe_into(delta, self.lexed_key(a, b), timestamp, sink)
+
+
+    def push_many(self, edges, sink):
+        """Push a batch of edges into sink, returning sink.current() after each edge."""
+        push, current = self.push, sink.current
+        results = []
+        for edge in edges:
+            push(edge, sink)
+            results.append(current())
+        return results
+
+
     def truncate(self, index):
-        """Roll trailing buckets, less than index, off the end of the cache."""
-        res = self.cache[0:index]        
-        del(self.cache[0:index])        
-        self.cache.extend([set() for i in xrange(len(res))])  
-        return res
+        """Roll trailing buckets, less than index, off the end of the cache.
+
+        Expired buckets are emptied in place and the head moves past them.
+
+        Returns:
+            list: edges held by the expired buckets
+
+        """
+        size   = self._buckets
+        window = self.cache
+        head   = self._head
+        count  = min(index, size)
+        expired = []
+
+        if self._wheel:
+            wheel    = self._wheel
+            occupied = self._occupied
+            while count > 0:
+                # jump to the next occupied slot, or past the end of the ring
+                slot  = head // wheel
+                ahead = self._slots >> slot
+                if not ahead:
+                    skip = size - head
+                else:
+                    slot += (ahead & -ahead).bit_length() - 1
+                    skip = max(0, slot * wheel - head)
+                if skip >= count:
+                    head = (head + count) % size
+                    break
+                if skip:
+                    head   = (head + skip) % size
+                    count -= skip
+                    continue
+                run = min(count, min((slot + 1) * wheel, size) - head)
+                for position in xrange(head, head + run):
+                    bucket = window[position]
+                    if bucket:
+                        expired.extend(bucket)
+                        bucket.clear()
+                        occupied[slot] -= 1
+                if not occupied[slot]:
+                    self._slots &= ~(1 << slot)
+                head   = (head + run) % size
+                count -= run
+        else:
+            for i in xrange(count):
+                bucket = window[(head + i) % size]
+                if bucket:
+                    expired.extend(bucket)
+                    bucket.clear()
+
+        self._head = (self._head + index) % size
+        return expired
+
+
+    def occupy(self, slot):
+        """Count a bucket of slot becoming non-empty."""
+        if not self._occupied[slot]:
+            self._slots |= 1 << slot
+        self._occupied[slot] += 1
 
 
     def evict_expired(self, delta):
         """Handles the removal of stale edges and bookkeeping operations of related structures."""
         
-        index = delta - self.size + 1        
-        truncated = self.truncate(index)        
-        flattened = list(chain.from_iterable(truncated))
+        index = hop(delta - self.size + 1, self._step) // self._step
+        flattened = self.truncate(index)
         
         evicted = {}
         for edge in flattened:
@@ -129,11 +324,49 @@ class Cache(object):
                 evicted[edge] = -1
                 del self.edges[edge]
 
-        log.debug("evicted: %s" % evicted)
-        log.debug("truncated: %s" % self.cache)
+        log.debug("evicted: %s", evicted)
+        log.debug("truncated: %s", self.cache)
         return evicted
 
         
+    def evict_into(self, delta, sink):
+        """Evict stale edges as evict_expired does, calling sink.edge_removed for each, returning the count."""
+        index = hop(delta - self.size + 1, self._step) // self._step
+        edges, lower_bound = self._edges, self._lower_bound
+        evicted = 0
+        for edge in self.truncate(index):
+            # an edge is in the bucket of each time-stamp it was seen at, evict it once
+            if edges.get(edge, lower_bound) < lower_bound:
+                del edges[edge]
+                sink.edge_removed(edge)
+                evicted += 1
+        return evicted
+
+
+    def observe_into(self, bucket, key, timestamp, sink):
+        """Apply an incoming edge, calling sink.edge_added if it is new to the window.
+
+        Only a new edge, or one seen at a later time-stamp, is added to a bucket.
+        It only ever needs to be in the bucket of its latest time-stamp.
+
+        """
+        edges = self._edges
+        previous = edges.get(key)
+        if previous is None:
+            edges[key] = timestamp
+            sink.edge_added(key)
+        elif timestamp > previous:
+            edges[key] = timestamp
+        else:
+            return
+
+        position = (self._head + bucket // self._step) % self._buckets
+        bucket = self._rolling_window[position]
+        if self._wheel and not bucket:
+            self.occupy(position // self._wheel)
+        bucket.add(key)
+
+
     def observe_edge(self, bucket, key, timestamp):
         """Apply operations to incoming edge."""
         obs = {}
@@ -144,6 +377,9 @@ class Cache(object):
             self.edges[key] = timestamp
             obs = {key: 1}
 
-        self.cache[bucket].add(key)
+        position = (self._head + bucket // self._step) % self._buckets
+        if self._wheel and not self.cache[position]:
+            self.occupy(position // self._wheel)
+        self.cache[position].add(key)
         return obs
 
@@ -0,0 +1,257 @@
+"""Engines compute the median degree of a stream of edges behind one interface.
+-----
+
+An engine takes edges in event order, `(actor, target, timestamp)`, and returns
+one median per edge. The naive engine is the reference, the logic of control.py.
+It rebuilds every node degree from the live edges and re-sorts them on each
+event. The other engines are the cache and reducer pipeline in its various
+configurations. `MedianDegreeEngine` is the one to embed in other services: it
+takes parsed edges, or columns of node ids and time-stamps, and returns medians
+in a typed array. `ENGINES` registers them by name, for `median_degree.py
+--engine` and for the differential harness, data-gen/differential.py.
+
+"""
+
+import logging as log
+
+from array import array
+from itertools import izip, imap
+from functools import partial
+from collections import defaultdict
+from edge_time_cache import Cache, hop, check_step
+from edge_store import ArrayCache
+from reducer import Reducer, HistogramReducer
+from partitioned_reducer import PartitionedReducer
+from interner import Interner
+
+
+REDUCERS = {
+    'sorted': Reducer,
+    'histogram': HistogramReducer,
+    'partitioned': PartitionedReducer,
+}
+
+
+class Engine(object):
+    """Push edges, get medians.
+
+    Args:
+        window (int): sliding window in seconds
+        step (int): seconds per hop of the window's lower-bound
+
+    """
+
+    def __init__(self, window=60, step=1):
+        check_step(window, step)
+        self.window = window
+        self.step = step
+
+
+    def push(self, edge):
+        """Observe one edge, returning the median degree after it."""
+        return self.push_many([edge])[0]
+
+
+    def push_many(self, edges):
+        """Observe a batch of edges, returning one median degree per edge."""
+        return [self.push(edge) for edge in edges]
+
+
+    def close(self):
+        """Release resources held by the engine, if any."""
+        pass
+
+
+class NaiveEngine(Engine):
+    """Reference engine, recounting and re-sorting all node degrees on every edge."""
+
+    def __init__(self, window=60, step=1):
+        Engine.__init__(self, window, step)
+        self.lower_bound = 0
+        self.edges = {}
+        self.nodes = {}
+
+
+    @staticmethod
+    def lexed_key(a,b):
+        """Lexicographically sort nodes in an edge and return a tuple key"""
+        if a < b:
+            return (a,b)
+        else:
+            return (b,a)
+
+
+    def push(self, edge):
+        a, b, timestamp = edge
+        edges = self.edges
+        key = self.lexed_key(a,b)
+        delta = timestamp - self.lower_bound
+
+        ## Reduce edges
+        if delta >= 0: # within window
+            if delta >= self.window: # ahead of window
+                # hop to the first multiple of step past timestamp - window
+                self.lower_bound = hop(timestamp - self.window + 1, self.step)
+                for edge in edges.keys():
+                    if edges[edge] < self.lower_bound:
+                        del edges[edge]
+
+            # observe current edge
+            try:
+                # touch ttl
+                if timestamp > edges[key]:
+                    edges[key] = timestamp
+            except KeyError:
+                # add edge
+                edges[key] = timestamp
+
+        ## Reduce nodes
+        nodes = defaultdict(int)
+        for edge in edges.keys():
+            a, b = edge
+            nodes[a] += 1
+            nodes[b] += 1
+        self.nodes = nodes
+
+        # determine degree distribution
+        dist = nodes.values()
+        dist.sort()
+        log.debug("dist(%i): %s", len(dist), dist)
+
+        # find median
+        length = len(dist)
+        if length % 2 == 0:
+            idx = (length / 2) - 1
+            return sum(d for d in dist[idx:idx+2]) / 2.0
+        else:
+            idx = (length - 1) / 2
+            return dist[idx]
+
+
+class CacheEngine(Engine):
+    """The rolling-window cache feeding a node reducer.
+
+    Args:
+        reducer (str): node reducer, a key of REDUCERS
+        intern (bool): map node names to integer ids, keying edges on packed integers
+        edge_store (str): with intern, 'dict' or 'array' edge store
+        wheel (int): buckets per timing-wheel slot, 0 disables
+        partitions (int): worker processes for the partitioned reducer
+        packed (bool): edges already carry integer node ids, key them as packed integers
+        callbacks (bool): the cache calls the reducer per edge in place of returning diffs
+
+    """
+
+    def __init__(self, window=60, step=1, reducer='sorted', intern=False, edge_store='dict',
+                 wheel=0, partitions=2, packed=False, callbacks=False):
+        Engine.__init__(self, window, step)
+        self.callbacks = callbacks
+        packed = packed or intern
+        if edge_store == 'array':
+            self.cache = ArrayCache(size=window, step=step)
+        else:
+            self.cache = Cache(size=window, step=step, wheel=wheel, packed=packed)
+        if reducer == 'partitioned':
+            self.reducer = PartitionedReducer(packed=packed, partitions=partitions)
+        else:
+            self.reducer = REDUCERS[reducer](packed=packed)
+        self.interner = Interner() if intern else None
+
+
+    @property
+    def edges(self):
+        return self.cache.edges
+
+    @property
+    def nodes(self):
+        return self.reducer.nodes
+
+
+    def push_many(self, edges):
+        if self.interner is not None:
+            edges = [self.interner.intern_edge(edge) for edge in edges]
+        if self.callbacks:
+            return self.cache.push_many(edges, self.reducer)
+        return self.reducer.apply_many(self.cache.update_many(edges))
+
+
+    def close(self):
+        self.reducer.close()
+
+
+class MedianDegreeEngine(CacheEngine):
+    """Library entry point, embedding the cache and reducer in-process.
+
+    Edges are pushed already parsed, one at a time or as columns: actor ids,
+    target ids and time-stamps, e.g. `array('l')`. Node ids are non-negative
+    integers below 2**32, keyed as packed integers; with `intern`, node names
+    are interned first. Medians are returned in an `array('d')`, or written
+    into a preallocated one. The cache calls back into the reducer, see
+    `Cache.push`, so no diffs are built per edge.
+
+    Args:
+        window (int): sliding window in seconds
+        step (int): seconds per hop of the window's lower-bound
+        reducer (str): node reducer, a key of REDUCERS
+        intern (bool): accept node names, interning them to ids
+
+    """
+
+    def __init__(self, window=60, step=1, reducer='histogram', intern=False, **kwargs):
+        CacheEngine.__init__(self, window, step, reducer=reducer, intern=intern, packed=True, **kwargs)
+
+
+    def push(self, edge):
+        if self.interner is not None:
+            edge = self.interner.intern_edge(edge)
+        self.cache.push(edge, self.reducer)
+        return self.reducer.current()
+
+
+    def push_many(self, edges):
+        if self.interner is not None:
+            edges = [self.interner.intern_edge(edge) for edge in edges]
+        medians = array('d', [0.0]) * len(edges)
+        self._fill(edges, medians)
+        return medians
+
+
+    def push_columns(self, actors, targets, timestamps, out=None):
+        """Observe a batch of edges given as columns, returning one median degree per edge.
+
+        Args:
+            actors, targets (sequence(int)): node ids, or names with `intern`
+            timestamps (sequence(int)): time-stamps in unix epoch
+            out array('d'): preallocated medians, at least one per edge, reused across calls
+
+        """
+        count = len(timestamps)
+        if out is None:
+            out = array('d', [0.0]) * count
+        elif len(out) < count:
+            raise ValueError('out holds %i medians, %i edges were pushed' % (len(out), count))
+        edges = izip(actors, targets, timestamps)
+        if self.interner is not None:
+            edges = imap(self.interner.intern_edge, edges)
+        self._fill(edges, out)
+        return out
+
+
+    def _fill(self, edges, out):
+        """Write the median after each edge into out, in place."""
+        push, sink, current = self.cache.push, self.reducer, self.reducer.current
+        for i, edge in enumerate(edges):
+            push(edge, sink)
+            out[i] = current()
+
+
+ENGINES = {
+    'naive': NaiveEngine,
+    'sorted': partial(CacheEngine, reducer='sorted'),
+    'histogram': partial(CacheEngine, reducer='histogram'),
+    'interned': partial(CacheEngine, reducer='histogram', intern=True),
+    'array': partial(CacheEngine, reducer='histogram', intern=True, edge_store='array'),
+    'partitioned': partial(CacheEngine, reducer='partitioned'),
+    'callbacks': partial(CacheEngine, reducer='histogram', intern=True, callbacks=True),
+    'library': partial(MedianDegreeEngine, intern=True),
+}
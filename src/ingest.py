@@ -0,0 +1,232 @@
+"""Ingest step feeds raw newline-delimited json events from live sources into the pipeline.
+-----
+
+Sources (a stream such as stdin, a tailed growing file, or a tcp/unix socket
+server accepting any number of producers) each run on their own thread and
+put lines onto one bounded queue. A full queue blocks the sources, which in
+turn stops reading from their producers, so backpressure reaches all the way
+back to the socket. The pipeline drains the queue in batches, and writes its
+median stream through a StreamSink, whose writer thread owns the output.
+
+"""
+
+import os
+import time
+import Queue
+import socket
+import logging as log
+import threading
+
+
+_DONE = object() # end of a source
+
+
+def parse_address(address):
+    """Split an input address into (family, address), 'tcp://host:port' or 'unix://path'."""
+    if address.startswith('tcp://'):
+        host, sep, port = address[len('tcp://'):].rpartition(':')
+        return (socket.AF_INET, (host or '127.0.0.1', int(port)))
+    if address.startswith('unix://'):
+        return (socket.AF_UNIX, address[len('unix://'):])
+    raise ValueError('unsupported address %r, expected tcp://host:port or unix://path' % address)
+
+
+def is_address(address):
+    return address.startswith('tcp://') or address.startswith('unix://')
+
+
+class Ingest(object):
+    """Merge lines from several sources into bounded batches.
+
+    Args:
+        maxsize (int): capacity of the line queue, producers block while it is full
+
+    """
+
+    def __init__(self, maxsize=10000):
+        self.queue = Queue.Queue(maxsize)
+        self.address = None # bound server address
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._sources = 0 # started, a source spawning others counts them before finishing
+        self._threads = []
+
+
+    def _start(self, target, *args):
+        with self._lock:
+            self._sources += 1
+        thread = threading.Thread(target=self._run, args=(target,) + args)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+
+    def _run(self, target, *args):
+        try:
+            target(*args)
+        except Exception:
+            log.exception("ingest source failed")
+        finally:
+            self.queue.put(_DONE)
+
+
+    def _put(self, line):
+        """Queue a line, blocking while the queue is full unless stopped."""
+        while not self._stop.is_set():
+            try:
+                self.queue.put(line, timeout=0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+
+    def add_stream(self, stream):
+        """Read lines from an open file-like stream, e.g. stdin, until EOF."""
+        self._start(self._read_stream, stream)
+
+
+    def _read_stream(self, stream):
+        for line in iter(stream.readline, ''):
+            if not self._put(line):
+                break
+
+
+    def add_tail(self, path, poll=0.1, idle=None):
+        """Follow a growing file from its start, like `tail -f`.
+
+        Args:
+            poll (float): seconds between checks for new data
+            idle (float): stop after this many seconds without new data, None follows forever
+
+        """
+        self._start(self._tail, path, poll, idle)
+
+
+    def _tail(self, path, poll, idle):
+        with open(path, 'r') as stream:
+            partial = ''
+            waited  = 0.0
+            while not self._stop.is_set():
+                line = stream.readline()
+                if not line:
+                    if idle is not None and waited >= idle:
+                        break
+                    time.sleep(poll)
+                    waited += poll
+                    continue
+                waited = 0.0
+                if not line.endswith('\n'): # writer is mid-line
+                    partial += line
+                    continue
+                if not self._put(partial + line):
+                    break
+                partial = ''
+            if partial:
+                self._put(partial)
+
+
+    def add_server(self, address, producers=0):
+        """Accept producer connections on a tcp or unix socket, one reader thread each.
+
+        Args:
+            address (str): 'tcp://host:port' (port 0 picks a free port) or 'unix://path'
+            producers (int): finish once this many producers have disconnected, 0 serves forever
+
+        """
+        family, bind = parse_address(address)
+        server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_UNIX and os.path.exists(bind):
+            os.unlink(bind)
+        else:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(bind)
+        server.listen(16)
+        server.settimeout(0.1)
+        self.address = server.getsockname()
+        self._start(self._serve, server, producers)
+
+
+    def _serve(self, server, producers):
+        accepted = 0
+        try:
+            while not self._stop.is_set() and (not producers or accepted < producers):
+                try:
+                    conn, peer = server.accept()
+                except socket.timeout:
+                    continue
+                accepted += 1
+                log.debug("producer connected: %s", peer)
+                conn.settimeout(None)
+                self._start(self._read_stream, conn.makefile('r'))
+        finally:
+            server.close()
+
+
+    def batches(self, size):
+        """Yield lists of up to `size` lines, until every source has finished.
+
+        Blocks for the first line of a batch, then takes whatever else is
+        already queued, so quiet streams are not held back waiting for a full batch.
+
+        """
+        finished = 0
+        while finished < self._sources:
+            item  = self.queue.get()
+            batch = []
+            while True:
+                if item is _DONE:
+                    finished += 1
+                else:
+                    batch.append(item)
+                if len(batch) >= size or finished == self._sources:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except Queue.Empty:
+                    break
+            if batch:
+                yield batch
+
+
+    def stop(self):
+        """Ask all sources to finish."""
+        self._stop.set()
+
+
+class StreamSink(object):
+    """File-like writer handing output to a background thread through a bounded queue.
+
+    Args:
+        outfile (file): output stream, flushed whenever the queue runs dry
+        maxsize (int): capacity of the output queue
+
+    """
+
+    def __init__(self, outfile, maxsize=10000):
+        self.outfile = outfile
+        self.queue = Queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._drain)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def _drain(self):
+        while True:
+            data = self.queue.get()
+            if data is _DONE:
+                break
+            self.outfile.write(data)
+            if self.queue.empty():
+                self.outfile.flush()
+        self.outfile.flush()
+
+
+    def write(self, data):
+        self.queue.put(data)
+
+
+    def close(self):
+        """Flush everything written so far and stop the writer thread."""
+        self.queue.put(_DONE)
+        self._thread.join()
@@ -0,0 +1,87 @@
+"""Interner assigns dense integer ids to node names at the map stage.
+-----
+
+Edges are then keyed on a single packed 64-bit integer, the lexically ordered
+pair of node ids `(low << 32) | high`, rather than a tuple of two strings. This
+keeps per-edge memory and hashing cost down in the cache and reducer. Names are
+kept for reverse lookup, and ids released by `compact` are reused for new names.
+
+"""
+
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+
+def pack_edge(a, b):
+    """Order the node ids of an edge and pack them into one integer key."""
+    if a < b:
+        return (a << ID_BITS) | b
+    else:
+        return (b << ID_BITS) | a
+
+
+def unpack_edge(key):
+    """Split a packed edge key back into its (low, high) node ids."""
+    return (key >> ID_BITS, key & ID_MASK)
+
+
+class Interner(object):
+    """Map node names to dense integer ids, and back."""
+
+    def __init__(self):
+        self.ids = {}   # key: str name, value: int id
+        self.names = [] # index: int id, value: str name, None once released
+        self.free = []  # released ids awaiting reuse
+
+
+    def __len__(self):
+        return len(self.ids)
+
+
+    def intern(self, name):
+        """Return the id of a name, assigning the next free id to unseen names."""
+        try:
+            return self.ids[name]
+        except KeyError:
+            if self.free:
+                node = self.free.pop()
+                self.names[node] = name
+            else:
+                node = len(self.names)
+                if node > ID_MASK:
+                    raise OverflowError('node id space exhausted')
+                self.names.append(name)
+            self.ids[name] = node
+            return node
+
+
+    def intern_edge(self, edge):
+        """Swap the node names of a mapped edge for their ids."""
+        (a, b, timestamp) = edge
+        return (self.intern(a), self.intern(b), timestamp)
+
+
+    def name(self, node):
+        """Reverse lookup of a node id, for debugging and output."""
+        return self.names[node]
+
+
+    def edge_names(self, key):
+        """Reverse lookup of a packed edge key."""
+        a, b = unpack_edge(key)
+        return (self.names[a], self.names[b])
+
+
+    def compact(self, live):
+        """Drop names whose ids are not in `live`, e.g. the reducer's nodes.
+
+        Returns:
+            int: number of names released
+
+        """
+        released = [node for node in self.ids.itervalues() if node not in live]
+        for node in released:
+            del self.ids[self.names[node]]
+            self.names[node] = None
+        self.free.extend(released)
+        return len(released)
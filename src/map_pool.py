@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""MapPool distributes the map step across worker processes in sequence-preserving batches.
+
+Raw input is read in chunks, each chunk is parsed by a worker into compact
+columns (actors, targets, timestamps), and the results are handed back strictly
+in input order. The number of chunks in flight is bounded to cap memory.
+
+Run as a script to benchmark the pool against the serial map step.
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+import argparse
+import logging as log
+import multiprocessing
+
+from itertools import islice, izip
+from collections import deque
+from mapper import json_to_edge, json_to_edges
+
+
+def read_batches(stream, size):
+    """Chunk a line stream into lists of at most `size` lines."""
+    return iter(lambda: list(islice(stream, size)), [])
+
+
+def map_batch(lines):
+    """Map a chunk of raw lines to a list of edge tuples."""
+    if not log.getLogger().isEnabledFor(log.DEBUG):
+        return json_to_edges(lines)
+
+    edges = []
+    for raw in lines:
+        log.debug("raw: %s", raw.rstrip())
+        edge = json_to_edge(raw)
+        log.debug("parsed(edge): [%s] %s -> %s", edge[2], edge[0], edge[1])
+        edges.append(edge)
+    return edges
+
+
+def map_columns(lines):
+    """Map a chunk of raw lines to edge columns, cheaper to send between processes than tuples."""
+    edges = json_to_edges(lines)
+    if not edges:
+        return ([], [], [])
+    return tuple(list(column) for column in izip(*edges))
+
+
+class MapPool(object):
+    """Process pool mapping batches of raw lines to edges, returned in input order.
+
+    Args:
+        workers (int): number of worker processes
+        inflight (int): max batches submitted but not yet consumed, default 2 per worker
+
+    """
+
+    def __init__(self, workers, inflight=None):
+        self.workers = workers
+        self.inflight = inflight or 2 * workers
+        self._pool = multiprocessing.Pool(workers)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def imap(self, batches):
+        """Yield the mapped edges of each batch, in order, keeping `inflight` batches queued."""
+        pending = deque()
+        for batch in batches:
+            pending.append(self._pool.apply_async(map_columns, (batch,)))
+            if len(pending) >= self.inflight:
+                yield zip(*pending.popleft().get())
+        while pending:
+            yield zip(*pending.popleft().get())
+
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+
+def benchmark(path, workers, batch_size):
+    """Time the serial map step and the pool over a file, returning events per second for each."""
+    results = {}
+    for count in [0] + workers:
+        with open(path, 'r') as stream:
+            start  = time.time()
+            events = 0
+            if count:
+                with MapPool(count) as pool:
+                    for edges in pool.imap(read_batches(stream, batch_size)):
+                        events += len(edges)
+            else:
+                for batch in read_batches(stream, batch_size):
+                    events += len(map_batch(batch))
+            elapsed = time.time() - start
+        results[count] = events / elapsed
+        print("workers=%i events=%i seconds=%.3f events/s=%.0f" % (count, events, elapsed, results[count]))
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('-i', '--input', required=True,
+        help="file containing json transactions")
+
+    parser.add_argument('-w', '--workers', type=int, nargs='+',
+        default=[1, 2, 4],
+        help="worker counts to benchmark against the serial map step")
+
+    parser.add_argument('-b', '--batch-size', type=int,
+        default=1024,
+        help="lines per batch")
+
+    if len(sys.argv[1:]) == 0:
+        parser.print_help()
+        parser.exit()
+
+    args = parser.parse_args()
+    benchmark(args.input, args.workers, args.batch_size)
@@ -1,8 +1,6 @@
 """Map helpers for processing raw input into structured data."""
 
 
-import time
-import logging as log
 import ujson as json
 
 from datetime import datetime
@@ -10,25 +8,166 @@ from datetime import datetime
 
 TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
 EPOCH = datetime(1970,1,1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+DAY_CACHE_SIZE = 1024
+SCAN_MIN_LENGTH = 512 # below this, a full ujson decode beats scanning for the edge fields
+_day_cache = {} # key: str date prefix, value: int epoch of midnight
+_last_time = [None, 0] # most recent (string, epoch), consecutive events mostly share a second
+
+
+def day_epoch(prefix):
+    """Convert a 'YYYY-MM-DD' prefix into the unix epoch of its midnight, memoized."""
+    try:
+        return _day_cache[prefix]
+    except KeyError:
+        if len(_day_cache) >= DAY_CACHE_SIZE:
+            _day_cache.clear()
+        date = datetime(int(prefix[0:4]), int(prefix[5:7]), int(prefix[8:10]))
+        base = (date.toordinal() - EPOCH_ORDINAL) * 86400
+        _day_cache[prefix] = base
+        return base
+
+
+def parse_fixed_time(string):
+    """Convert a fixed-width '%Y-%m-%dT%H:%M:%SZ' string into unix epoch.
+
+    Raises:
+        ValueError: string does not follow the fixed-width layout
+
+    """
+    if string == _last_time[0]:
+        return _last_time[1]
+    if (len(string) != 20 or string[4] != '-' or string[7] != '-' or string[10] != 'T'
+            or string[13] != ':' or string[16] != ':' or string[19] != 'Z'):
+        raise ValueError('time data %r does not match fixed format %r' % (string, TIME_FORMAT))
+    hours, minutes, seconds = string[11:13], string[14:16], string[17:19]
+    if not (hours.isdigit() and minutes.isdigit() and seconds.isdigit()
+            and hours < '24' and minutes < '60' and seconds < '60'):
+        raise ValueError('time data %r has an invalid time of day' % string)
+    prefix = string[0:10]
+    if not (prefix[0:4].isdigit() and prefix[5:7].isdigit() and prefix[8:10].isdigit()):
+        raise ValueError('time data %r has an invalid date' % string)
+    # datetime rejects out of range dates on a cache miss
+    timestamp = day_epoch(prefix) + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    _last_time[0], _last_time[1] = string, timestamp
+    return timestamp
 
 
 # Convert time to epoch
-def parse_time_string(string):
-    """Convert time format into unix epoch."""
-    try:        
-        time = datetime.strptime(string, TIME_FORMAT)
-        timestamp = (time - EPOCH).total_seconds()
+def parse_time_string(string, strict=False):
+    """Convert time format into unix epoch.
+
+    Fixed-width strings take the fast path, anything else falls back on strptime
+    unless `strict`, in which case it is rejected. A missing (None) time maps to 0,
+    or raises a ValueError when `strict`.
+
+    """
+    try:
+        return parse_fixed_time(string)
     except TypeError:
-        timestamp = 0
+        if strict:
+            raise ValueError('time data is missing')
+        return 0
+    except ValueError:
+        if strict:
+            raise
+
+    time = datetime.strptime(string, TIME_FORMAT)
+    timestamp = (time - EPOCH).total_seconds()
     return int(timestamp)
 
 
-def json_to_edge(string):
-    """Transform raw json to edge tuple."""
-    data = json.loads(string)
+def scan_value(string, key):
+    """Scan a flat json object for the string value of a quoted key, without decoding it.
+
+    The last occurrence is taken, as a full decode keeps the last of repeated
+    keys. Returns None when the value can not be taken as is: the key is
+    missing, escaped, not followed by a string value, or the value holds an
+    escape sequence.
+
+    """
+    start = string.rfind(key)
+    if start < 1 or string[start - 1] == '\\':
+        return None
+    end = start + len(key)
+    if string.startswith(': "', end):
+        end += 3
+    elif string.startswith(':"', end):
+        end += 2
+    else:
+        return None
+    close = string.find('"', end)
+    if close < 0:
+        return None
+    value = string[end:close]
+    if '\\' in value:
+        return None
+    return value
+
+
+def scan_edge(string):
+    """Scan raw json for the edge fields, None if the line needs a full decode.
+
+    Only flat objects are scanned, a nested object could hold the same keys.
+
+    """
+    if string.count('{') != 1 or not (string.endswith('}\n') or string.endswith('}')):
+        return None
+    actor = scan_value(string, '"actor"')
+    target = scan_value(string, '"target"')
+    created = scan_value(string, '"created_time"')
+    if actor is None or target is None or created is None:
+        return None
+    try:
+        # decoded as a full decode would
+        return (unicode(actor, 'utf-8'), unicode(target, 'utf-8'), parse_time_string(created))
+    except UnicodeDecodeError:
+        return None
+
+
+def decode_edge(data):
+    """Transform a decoded json object to edge tuple."""
     timestamp = parse_time_string(data.get('created_time'))
     actor = data.get('actor')
     target = data.get('target')
-    log.debug("parsed(edge): [%s] %s -> %s" % (timestamp,actor,target))
     return (actor, target, timestamp)
 
+
+def json_to_edge(string):
+    """Transform raw json to edge tuple.
+
+    Long lines are scanned for the three edge fields, skipping the decode of
+    every other field. Short lines, and lines the scan can not take, are
+    decoded in full.
+
+    """
+    if len(string) >= SCAN_MIN_LENGTH:
+        edge = scan_edge(string)
+        if edge is not None:
+            return edge
+    return decode_edge(json.loads(string))
+
+
+def json_to_edges(lines):
+    """Transform a batch of raw json lines to edge tuples.
+
+    Lookups are bound once per batch, and consecutive lines sharing a time
+    string skip parsing it again. Long lines are scanned as by json_to_edge.
+
+    """
+    loads = json.loads
+    edges = []
+    append = edges.append
+    last, timestamp = None, 0
+    for raw in lines:
+        if len(raw) >= SCAN_MIN_LENGTH:
+            append(json_to_edge(raw))
+            continue
+        get = loads(raw).get
+        created = get('created_time')
+        if created != last or created is None:
+            timestamp = parse_time_string(created)
+            last = created
+        append((get('actor'), get('target'), timestamp))
+    return edges
@@ -8,10 +8,26 @@ import sys
 import argparse
 import logging as log
 import coloredlogs
+import checkpoint
 
+from itertools import izip
+from collections import deque
 from mapper import json_to_edge
+from map_pool import MapPool, map_batch, read_batches
 from edge_time_cache import Cache
-from reducer import Reducer
+from edge_store import ArrayCache
+from sharded_cache import ShardedCache
+from multi_window import MultiWindowCache, MultiReducer
+from reducer import Reducer, HistogramReducer, parse_statistics
+from partitioned_reducer import PartitionedReducer
+from engines import ENGINES, REDUCERS
+from ingest import Ingest, StreamSink, is_address
+from interner import Interner
+from reorder import ReorderBuffer
+from columnar import ColumnarReader
+from time_index import TimeRange, open_range, parse_bound, EVERY
+from collector import Collector, emit, emit_period
+from stats import Stats, TimedWriter, NULL_STATS
 
 # Debugging
 # import pprint as pp
@@ -26,46 +42,272 @@ LOGGING = {
     },
 }
 
+OUTPUT_BUFFER = 8192 # lines, also flushed after every batch
 
 # -------------
-def emit(value):
-    """Workaround for Python's default rounding behavior"""
-    str_deg = '%.3f' % value
-    integer_deg, sep, decimal_deg = str_deg.partition('.')
-    return '.'.join( [integer_deg, (decimal_deg+'0'*2)[:2]])
-
-
-def main(args):
-    lru_edge_cache  = Cache(size=args.window)
-    reduce_node_deg = Reducer()
+def pipeline(args, batches, outfile, resume=None, stats=NULL_STATS, mapped=False):
+    """Map, reduce and collect batches of raw lines, writing medians to outfile.
+
+    Args:
+        resume tuple(dict, dict): checkpoint header and sections to start from
+        stats (Stats): per-stage timings and counters, dumped periodically and at exit
+        mapped (bool): batches are already lists of edges with interned node ids, e.g. from a columnar file
+
+    """
+    if stats.enabled:
+        outfile = TimedWriter(outfile, stats)
+    engine = None
+    if args.engine:
+        # the engine stands in for both the cache and the reducer
+        engine = ENGINES[args.engine](window=args.window[0], step=args.step)
+        lru_edge_cache = reduce_node_deg = engine
+    elif len(args.window) > 1:
+        lru_edge_cache  = MultiWindowCache(args.window, step=args.step, packed=args.intern, stats=stats)
+        reduce_node_deg = MultiReducer([node_reducer(args) for size in args.window],
+                                       largest=args.window.index(max(args.window)))
+    else:
+        if args.shards:
+            lru_edge_cache = ShardedCache(size=args.window[0], step=args.step, shards=args.shards, wheel=args.wheel,
+                                          batch=args.batch_size, stats=stats)
+        elif args.edge_store == 'array':
+            lru_edge_cache = ArrayCache(size=args.window[0], step=args.step, stats=stats)
+        else:
+            lru_edge_cache = Cache(size=args.window[0], step=args.step, wheel=args.wheel, packed=args.intern,
+                                   stats=stats)
+        reduce_node_deg = node_reducer(args)
+    interner = Interner() if args.intern and not mapped else None
+    compact_at = args.compact_every
 
     if args.control:
         control = open(args.control, 'r')
 
-    with open(args.input, 'r') as trans, open(args.output, 'w') as outfile:
-        for i, raw in enumerate(trans): 
-
-            # Input control supplied
-            expect = control.readline().rstrip() if args.control else 'NA'
-
-            # Ingest, as raw "events" from file stream
-            log.debug("raw:%i: %s" % (i, raw.rstrip()))     
-            
-            # Map, raw to tuple/edge representation 
-            edge = json_to_edge(raw)
+    collector = Collector(outfile, period=args.emit_every, changes_only=args.changes_only,
+                          buffer=OUTPUT_BUFFER, columns=len(args.window) > 1 or args.quantiles is not None)
+    verbose   = args.control or log.getLogger().isEnabledFor(log.INFO)
+
+    # Restore checkpointed state, tracking input bytes consumed per batch
+    i = offset = 0
+    if resume is not None:
+        header, sections = resume
+        interner   = checkpoint.restore(header, sections, lru_edge_cache, reduce_node_deg, collector,
+                                         packed=args.intern)
+        i          = header['events']
+        offset     = header['input']
+        compact_at = header['compact_at']
+    checkpoint_at = i + args.checkpoint_every
+    if args.checkpoint_dir:
+        sizes   = deque()
+        batches = measure_batches(batches, sizes)
+
+    pool = MapPool(args.map_workers) if args.map_workers and not mapped else None
+    try:
+        if mapped:
+            mapped = iter(batches)
+        elif pool is not None:
+            mapped = pool.imap(batches)
+        else:
+            mapped = (map_batch(batch) for batch in batches)
+        if args.lateness is not None:
+            reorder = ReorderBuffer(args.lateness, stats=stats)
+            mapped  = reorder.batches(mapped)
+        time_range = None
+        if args.start is not None or args.stop is not None:
+            time_range = TimeRange(args.start, args.stop)
+
+        while True:
+            # Map, raw to tuple/edge representation, node names to ids
+            with stats.stage('map'):
+                edges = next(mapped, None)
+                if edges is not None and interner is not None:
+                    edges = [interner.intern_edge(edge) for edge in edges]
+            if edges is None:
+                break
+
+            # Range replay, warm up on edges before the range without emitting
+            if time_range is not None:
+                warm, edges = time_range.clip(edges)
+                if warm and engine is not None:
+                    with stats.stage('reduce'):
+                        engine.push_many(warm)
+                elif warm and args.callbacks:
+                    with stats.stage('cache'):
+                        for edge in warm:
+                            lru_edge_cache.push(edge, reduce_node_deg)
+                elif warm:
+                    with stats.stage('cache'):
+                        for diff in lru_edge_cache.update_many(warm):
+                            reduce_node_deg.apply(diff)
+            i += len(edges)
+            stats.count('events', len(edges))
+
+            if engine is not None:
+                # 1st and 2nd Reduce, by the selected engine
+                with stats.stage('reduce'):
+                    results = engine.push_many(edges)
+            elif args.callbacks:
+                # 1st and 2nd Reduce, the cache calling back into the reducer per edge
+                with stats.stage('reduce'):
+                    if collector.period:
+                        results = ()
+                        for edge in edges:
+                            collector.observe(edge[2], reduce_node_deg)
+                            lru_edge_cache.push(edge, reduce_node_deg)
+                    else:
+                        results = lru_edge_cache.push_many(edges, reduce_node_deg)
+            else:
+                # 1st Reduce, updates by cache bucket
+                with stats.stage('cache'):
+                    diffs = lru_edge_cache.update_many(edges)
+                if stats.enabled:
+                    stats.count('reducer_updates', sum(1 for diff in diffs if diff))
+
+                # 2nd Reduce, updates into one value per input event
+                with stats.stage('reduce'):
+                    if collector.period:
+                        results = ()
+                        for edge, diff in izip(edges, diffs):
+                            collector.observe(edge[2], reduce_node_deg)
+                            reduce_node_deg.apply(diff)
+                    else:
+                        results = reduce_node_deg.apply_many(diffs)
+
+            # Collect
+            with stats.stage('emit'):
+                if verbose:
+                    for result in results:
+                        # Input control supplied
+                        expect = control.readline().rstrip() if args.control else 'NA'
+
+                        emit_result = collector.collect(result)
+                        log.info("output (median degree): r= %s  e= %s", emit_result, expect)
+                else:
+                    collect = collector.collect
+                    for result in results:
+                        collect(result)
+            collector.flush()
+
+            # Release ids of nodes no longer in any live edge
+            if interner is not None and args.compact_every and i >= compact_at:
+                compact_at = i + args.compact_every
+                released = interner.compact(reduce_node_deg.nodes)
+                log.debug("compacted: %i ids released, %i live", released, len(interner))
+
+            # Checkpoint state, with all output up to here flushed
+            if args.checkpoint_dir:
+                offset += sizes.popleft()
+                if i >= checkpoint_at:
+                    checkpoint_at = i + args.checkpoint_every
+                    outfile.flush()
+                    checkpoint.save(args.checkpoint_dir, lru_edge_cache, reduce_node_deg, interner, collector,
+                        input=offset, output=outfile.tell(), events=i, compact_at=compact_at)
+
+            if stats.due():
+                dump_stats(stats, lru_edge_cache, reduce_node_deg, collector)
+
+            if time_range is not None and time_range.closed:
+                break
+
+        if args.checkpoint_dir:
+            outfile.flush()
+            checkpoint.save(args.checkpoint_dir, lru_edge_cache, reduce_node_deg, interner, collector,
+                input=offset, output=outfile.tell(), events=i, compact_at=compact_at)
+        collector.close(reduce_node_deg)
+        reduce_node_deg.close()
+        if args.lateness is not None and reorder.too_late:
+            log.warning("%i events arrived more than %is late, behind the watermark", reorder.too_late, args.lateness)
+        dump_stats(stats, lru_edge_cache, reduce_node_deg, collector, final=True)
+    finally:
+        if pool is not None:
+            pool.close()
+        if args.shards:
+            lru_edge_cache.close()
+
+
+def dump_stats(stats, cache, reducer, collector, final=False):
+    """Gauge live state and dump a stats snapshot."""
+    if not stats.enabled:
+        return
+    stats.gauge('live_edges', len(cache.edges))
+    stats.gauge('live_nodes', len(reducer.nodes))
+    stats.counters['emitted'] = collector.emitted
+    stats.dump(final)
+
+
+def node_reducer(args):
+    if args.reducer == 'partitioned':
+        return PartitionedReducer(packed=args.intern, partitions=args.partitions, statistics=args.quantiles)
+    return REDUCERS[args.reducer](packed=args.intern, statistics=args.quantiles)
+
+
+def measure_batches(batches, sizes):
+    """Pass batches through, appending the byte size of each to sizes."""
+    for batch in batches:
+        sizes.append(sum(len(raw) for raw in batch))
+        yield batch
 
-            # 1st Reduce, updates by cache bucket
-            diff = lru_edge_cache.update(edge)          
 
-            # 2nd Reduce, updates into one value per input event
-            result = reduce_node_deg.update(diff)
-            
-            # Collect, output  
-            emit_result = emit(result)
-            log.info("output (median degree): r= %s  e= %s" % (emit_result,expect))            
-            print(emit(result), file=outfile)           
-    
-            log.debug("\n----------\n")         
+def main(args):
+    # Ingest, from a file, or a live stream: stdin, a tailed file, or a socket
+    ingest = None
+    if args.input == '-' or args.follow or is_address(args.input):
+        ingest = Ingest(maxsize=args.queue_size)
+        if is_address(args.input):
+            ingest.add_server(args.input, producers=args.producers)
+            log.info("listening on %s", ingest.address)
+        elif args.input == '-':
+            ingest.add_stream(sys.stdin)
+        else:
+            ingest.add_tail(args.input, idle=args.idle_timeout)
+
+    # Resume, from the input and output offsets of the last checkpoint
+    if args.checkpoint_dir and not os.path.isdir(args.checkpoint_dir):
+        os.makedirs(args.checkpoint_dir)
+    if args.index_dir and not os.path.isdir(args.index_dir):
+        os.makedirs(args.index_dir)
+    resume = None
+    if args.resume and os.path.exists(checkpoint.checkpoint_path(args.checkpoint_dir)):
+        resume = checkpoint.load(args.checkpoint_dir)
+        header = resume[0]
+        log.info("resuming at event %i, input byte %i", header['events'], header['input'])
+        outfile = open(args.output, 'r+')
+        outfile.truncate(header['output'])
+        outfile.seek(header['output'])
+    else:
+        outfile = sys.stdout if args.output == '-' else open(args.output, 'w', 1 << 16)
+
+    stats = NULL_STATS
+    if args.stats:
+        stats_file = sys.stderr if args.stats == '-' else open(args.stats, 'w')
+        stats = Stats(stats_file, every=args.stats_every)
+
+    try:
+        if args.columnar:
+            reader = ColumnarReader(args.input)
+            try:
+                pipeline(args, reader.batches(args.batch_size), outfile, stats=stats, mapped=True)
+            finally:
+                reader.close()
+        elif ingest is None:
+            if args.start is not None or args.stop is not None:
+                lines = open_range(args.input, args.start, max(args.window), args.index_every, args.index_dir)
+                pipeline(args, read_batches(lines, args.batch_size), outfile, stats=stats)
+            else:
+                with open(args.input, 'r') as trans:
+                    if resume is not None:
+                        trans.seek(resume[0]['input'])
+                    pipeline(args, read_batches(trans, args.batch_size), outfile, resume, stats)
+        else:
+            sink = StreamSink(outfile, maxsize=args.queue_size)
+            try:
+                pipeline(args, ingest.batches(args.batch_size), sink, stats=stats)
+            finally:
+                ingest.stop()
+                sink.close()
+    finally:
+        if outfile is not sys.stdout:
+            outfile.close()
+        if args.stats and args.stats != '-':
+            stats_file.close()
 
 
 # --------------------------------------------------------------------
@@ -81,24 +323,132 @@ if __name__ == '__main__':
     parser.add_argument('-i', '--input', required=True, nargs='?',
         const='./venmo_input/venmo-trans.txt',
         default='./venmo_input/venmo-trans.txt',
-        help="file containing json transactions from venmo api")
+        help="file containing json transactions from venmo api, '-' for stdin, "
+             "or a socket to listen on for producers, tcp://host:port or unix://path")
 
     parser.add_argument('-o', '--output',
         default='./venmo_output/output.txt',
-        help="output median vertex degrees, one per transaction")
+        help="output median vertex degrees, one per transaction, '-' for stdout")
+
+    parser.add_argument('--columnar', action='store_true',
+        help="the input is a columnar edge file, converted once by columnar.py; with --intern its ids "
+             "are keyed as they are")
+
+    parser.add_argument('-f', '--follow', action='store_true',
+        help="tail the input file as it grows")
+
+    parser.add_argument('--idle-timeout', type=float,
+        help="with --follow, stop after this many seconds without new input")
+
+    parser.add_argument('--producers', type=int,
+        default=0,
+        help="with a socket input, stop once this many producers have disconnected (0 serves forever)")
+
+    parser.add_argument('--queue-size', type=int,
+        default=10000,
+        help="bounded queue capacity between live sources, pipeline and output")
 
     parser.add_argument('-c', '--control', nargs='?',
         const='./venmo_output/control.txt',
         help="input control")
 
-    parser.add_argument('-w', '--window', type=int,
-        default=60,
-        help="sliding window (lagging) in seconds")
+    parser.add_argument('--from', dest='start', type=parse_bound, metavar='TIME',
+        help="only write medians from this event time on, a unix epoch or %%Y-%%m-%%dT%%H:%%M:%%SZ; "
+             "the input is indexed, so reading starts one window before")
+
+    parser.add_argument('--to', dest='stop', type=parse_bound, metavar='TIME',
+        help="stop after this event time, inclusive")
+
+    parser.add_argument('--index-every', type=int,
+        default=EVERY,
+        help="with --from, lines between entries of the time index kept next to the input")
+
+    parser.add_argument('--index-dir', metavar='DIR',
+        help="with --from, keep the time index in this directory instead of next to the input")
+
+    parser.add_argument('-w', '--window', type=int, nargs='+',
+        default=[60],
+        help="sliding window (lagging) in seconds, several windows write one column each")
+
+    parser.add_argument('--lateness', type=int, metavar='SECONDS',
+        help="hold events up to SECONDS behind the latest time-stamp, releasing them in time order "
+             "(0 keeps arrival order, counting late events)")
+
+    parser.add_argument('-e', '--emit-every', type=emit_period, metavar='{event,second,N}',
+        default='event',
+        help="emit a median per event, or once per second or N seconds of event time, "
+             "prefixed by the period's start time-stamp")
+
+    parser.add_argument('--changes-only', action='store_true',
+        help="suppress emissions equal to the previous one")
 
-    # NOT IMPLEMENTED
-    # parser.add_argument('-s', '--step', type=int,
-    #     default=1,
-    #     help="increment window in steps of size STEP")
+    parser.add_argument('--quantiles', type=parse_statistics, metavar='Q[,Q...]',
+        help="write these degree statistics in place of the median, e.g. 0.5,0.9,0.99,mean,max, "
+             "one column each")
+
+    parser.add_argument('-b', '--batch-size', type=int,
+        default=1024,
+        help="events mapped and reduced per batch")
+
+    parser.add_argument('--checkpoint-dir',
+        help="periodically save cache and reducer state, with input and output offsets, to this directory")
+
+    parser.add_argument('--checkpoint-every', type=int,
+        default=100000,
+        help="with --checkpoint-dir, events between checkpoints")
+
+    parser.add_argument('--resume', action='store_true',
+        help="with --checkpoint-dir, continue from the last checkpoint if one exists")
+
+    parser.add_argument('-m', '--map-workers', type=int,
+        default=0,
+        help="map batches in N worker processes, keeping input order (0 maps inline)")
+
+    parser.add_argument('--wheel', type=int,
+        default=0,
+        help="buckets per timing-wheel slot, skips empty buckets on eviction for long windows (0 disables)")
+
+    parser.add_argument('--intern', action='store_true',
+        help="map node names to dense integer ids, keying edges on packed integers")
+
+    parser.add_argument('--edge-store', choices=['dict', 'array'],
+        default='dict',
+        help="with --intern, keep live edges in a dict and bucket sets, or in compact typed arrays")
+
+    parser.add_argument('--shards', type=int,
+        default=0,
+        help="with --intern, shard the edge cache by edge key over N worker processes (0 keeps it inline)")
+
+    parser.add_argument('--compact-every', type=int,
+        default=100000,
+        help="with --intern, release ids of nodes outside the window every N events (0 disables)")
+
+    parser.add_argument('--engine', choices=sorted(ENGINES),
+        help="run a registered engine in place of the cache and reducer options, e.g. naive for the "
+             "reference logic of control.py")
+
+    parser.add_argument('--callbacks', action='store_true',
+        help="have the cache call the reducer as edges enter and leave the window, in place of per-event diffs")
+
+    parser.add_argument('-r', '--reducer', choices=sorted(REDUCERS),
+        default='sorted',
+        help="node-reducer degree distribution, blist sorted list, degree histogram, or node partitioned histogram")
+
+    parser.add_argument('-p', '--partitions', type=int,
+        default=2,
+        help="worker processes for the partitioned reducer")
+
+    parser.add_argument('--stats', nargs='?', metavar='FILE',
+        const='-',
+        help="dump per-stage timings, counters and gauges as json lines, to stderr or FILE")
+
+    parser.add_argument('--stats-every', type=float, metavar='SECONDS',
+        default=10.0,
+        help="with --stats, seconds between snapshots (0 only dumps at exit)")
+
+    parser.add_argument('-s', '--step', type=int,
+        default=1,
+        help="increment window in steps of size STEP, hopping the lower-bound in multiples of STEP seconds")
 
     parser.add_argument('-d', '--debug', dest='log_lvl', nargs='?', 
         const='DEBUG',
@@ -115,6 +465,35 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
 
+    if args.checkpoint_dir and (args.output == '-' or args.input == '-' or args.follow or is_address(args.input)):
+        parser.error("--checkpoint-dir needs a file input and output to resume from")
+    if not 1 <= args.step <= min(args.window):
+        parser.error("--step must be within 1 and the smallest --window")
+    if args.checkpoint_dir and len(args.window) > 1:
+        parser.error("--checkpoint-dir supports a single --window")
+    if args.edge_store == 'array' and (not args.intern or args.wheel or len(args.window) > 1):
+        parser.error("--edge-store array needs --intern, a single --window and no --wheel")
+    if args.checkpoint_dir and args.lateness is not None:
+        parser.error("--checkpoint-dir does not save events held by --lateness")
+    if (args.start is not None or args.stop is not None) and (
+            args.checkpoint_dir or args.input == '-' or args.follow or is_address(args.input)):
+        parser.error("--from and --to need a file input, and no --checkpoint-dir")
+    if args.engine and (args.checkpoint_dir or args.emit_every or len(args.window) > 1
+                        or args.quantiles is not None or args.intern):
+        parser.error("--engine runs per event over a single --window, without --checkpoint-dir, "
+                     "--emit-every, --quantiles or --intern")
+    if args.columnar and (args.checkpoint_dir or args.map_workers or args.start is not None
+                          or args.stop is not None or args.input == '-' or args.follow or is_address(args.input)):
+        parser.error("--columnar needs a file input, without --checkpoint-dir, --map-workers, --from or --to")
+    if args.callbacks and (args.engine or len(args.window) > 1 or args.reducer == 'partitioned'):
+        parser.error("--callbacks needs a single --window and the sorted or histogram reducer, without --engine")
+    if args.shards and (not args.intern or args.engine or args.checkpoint_dir or len(args.window) > 1
+                        or args.edge_store == 'array'):
+        parser.error("--shards needs --intern and a single --window, without --engine, --checkpoint-dir "
+                     "or --edge-store array")
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume needs --checkpoint-dir")
+
     import logging.config
     logging.config.dictConfig(LOGGING)
     coloredlogs.install(level=args.log_lvl)
@@ -0,0 +1,177 @@
+"""MultiWindow computes medians for several window sizes in one pass over the stream.
+-----
+
+One edge store, keyed like the single-window cache, holds each live edge's
+latest time-stamp, sized for the largest window. Each window keeps its own
+eviction frontier (lower-bound), advanced exactly as a single `Cache` of that
+size would advance it, and its own degree structure.
+
+An edge is live in a window while its latest time-stamp is at or past the
+window's lower-bound. Buckets are indexed by time-stamp modulo the largest
+window, and an edge sits in the bucket of its latest time-stamp. A frontier
+moving from `old` to `new` scans the buckets of time-stamps `old .. new - 1`,
+evicting those edges whose latest time-stamp is the scanned one. Only the largest
+window's frontier clears buckets and drops edges from the store. With a `step`,
+every frontier hops in multiples of `step` seconds.
+
+Per window, the diffs are the same as those of a `Cache` of that size, so each
+column of output matches a single-window run.
+
+"""
+
+import logging as log
+from collections import defaultdict
+from edge_time_cache import Cache, hop, check_step
+from interner import pack_edge
+from stats import NULL_STATS
+
+
+class MultiWindowCache(object):
+    """Edge store shared by several sliding windows, each with its own frontier.
+
+    Args:
+        sizes list(int): window sizes in seconds, in output column order
+        step (int): seconds per hop of the lower-bounds
+        packed (bool): edges carry interned integer node ids, key them as packed integers
+        stats (Stats): instrumentation, times evictions and counts window advances
+
+    """
+
+    def __init__(self, sizes, step=1, packed=False, stats=NULL_STATS):
+        self.sizes = list(sizes)
+        check_step(min(self.sizes), step)
+        self.step = step
+        self._span = max(self.sizes)
+        self._largest = self.sizes.index(self._span)
+        self._lower_bounds = [0] * len(self.sizes)
+        self._buckets = [set() for i in xrange(self._span)]
+        self._edges = {} # key: latest time-stamp
+        self._latest = None # latest accepted time-stamp
+        self.lexed_key = pack_edge if packed else Cache.lexed_key
+        self.stats = stats
+
+
+    @property
+    def edges(self):
+        return self._edges
+
+    @property
+    def lower_bounds(self):
+        return self._lower_bounds
+
+
+    def update(self, edge):
+        """Update the store with an edge observation, returning one diff per window."""
+        return self.fold(edge)
+
+
+    def update_many(self, edges):
+        """Update the store with a batch of edge observations.
+
+        Returns:
+            list(tuple(dict)): per edge, one diff per window
+
+        """
+        return [self.fold(edge) for edge in edges]
+
+
+    def fold(self, edge):
+        """Apply an edge observation, returning its diff for each window."""
+        (a, b, timestamp) = edge
+        key  = self.lexed_key(a, b)
+        diffs = tuple(defaultdict(int) for size in self.sizes)
+
+        # Advance frontiers the event moves past, the largest window last
+        for w, size in enumerate(self.sizes):
+            if w != self._largest and timestamp >= self._lower_bounds[w] + size:
+                self.advance(w, hop(timestamp - size + 1, self.step), diffs[w])
+        w = self._largest
+        if timestamp >= self._lower_bounds[w] + self._span:
+            self.advance(w, hop(timestamp - self._span + 1, self.step), diffs[w])
+
+        # Behind every window, do nothing
+        if timestamp < self._lower_bounds[self._largest]:
+            return diffs
+
+        previous = self._edges.get(key)
+        for w, lower_bound in enumerate(self._lower_bounds):
+            if timestamp >= lower_bound and (previous is None or previous < lower_bound):
+                diffs[w][key] += 1
+        if previous is None or timestamp > previous:
+            self._edges[key] = timestamp
+            self._buckets[timestamp % self._span].add(key)
+        if self._latest is None or timestamp > self._latest:
+            self._latest = timestamp
+        return diffs
+
+
+    def advance(self, w, lower_bound, diff):
+        """Move window w's frontier up to lower_bound, evicting edges it passes into diff."""
+        start = self._lower_bounds[w]
+        self._lower_bounds[w] = lower_bound
+        end = start if self._latest is None else min(lower_bound, self._latest + 1)
+        largest = w == self._largest
+        edges   = self._edges
+        evicted = 0
+        with self.stats.stage('evict'):
+            for timestamp in xrange(start, end):
+                bucket = self._buckets[timestamp % self._span]
+                if not bucket:
+                    continue
+                for key in bucket:
+                    if edges.get(key) == timestamp:
+                        diff[key] -= 1
+                        evicted += 1
+                if largest:
+                    for key in bucket:
+                        if edges.get(key) == timestamp:
+                            del edges[key]
+                    bucket.clear()
+        self.stats.count('window_advances')
+        self.stats.count('evicted_edges', evicted)
+        log.debug("lower_bound[%i]-> %i, evicted %i", self.sizes[w], lower_bound, evicted)
+
+
+class MultiReducer(object):
+    """Fan per-window diffs out to one reducer per window, reducing to a tuple of medians.
+
+    Args:
+        reducers list(Reducer): one reducer per window, in column order
+        largest (int): index of the largest window, whose nodes are a superset of the others
+
+    """
+
+    def __init__(self, reducers, largest=0):
+        self.reducers = reducers
+        self.largest = largest
+
+
+    @property
+    def nodes(self):
+        return self.reducers[self.largest].nodes
+
+
+    def apply(self, diffs):
+        for reducer, diff in zip(self.reducers, diffs):
+            reducer.apply(diff)
+
+
+    def current(self):
+        return tuple(reducer.current() for reducer in self.reducers)
+
+
+    def update(self, diffs):
+        self.apply(diffs)
+        return self.current()
+
+
+    def apply_many(self, diffs):
+        """Reduce a batch of per-window diffs, one tuple of medians per event."""
+        columns = zip(*diffs) if diffs else [[] for reducer in self.reducers]
+        return zip(*[reducer.apply_many(list(column))
+                     for reducer, column in zip(self.reducers, columns)])
+
+
+    def close(self):
+        for reducer in self.reducers:
+            reducer.close()
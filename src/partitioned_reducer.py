@@ -0,0 +1,262 @@
+"""PartitionedReducer spreads node degrees across worker processes by node key.
+-----
+
+Each worker owns a hash partition of the nodes, maintaining their degrees and
+the partition's own DegreeHistogram. The coordinator splits a batch of diffs
+(`apply_many`) by node hash, sending each partition only its own `(event, node,
+change)` triples. Each partition applies them and replies with its histogram's
+net count deltas, `(degree, delta)` pairs per event, moves which cancel out
+within an event leaving nothing. The coordinator merges the partitions' deltas,
+in event order, into one global DegreeHistogram, so the median per event is
+exact. Loading nodes merges the partitions' whole histograms the same way.
+
+"""
+
+import marshal
+import logging as log
+import multiprocessing
+
+from array import array
+from reducer import Reducer
+from degree_histogram import DegreeHistogram
+from interner import unpack_edge
+
+
+def _close_event(counts, deltas):
+    """Append an event's net count changes to deltas, and clear them."""
+    for degree, delta in counts.iteritems():
+        if delta:
+            deltas.extend((degree, delta))
+    counts.clear()
+
+
+def partition_worker(conn):
+    """Serve node updates for one partition.
+
+    Receives marshalled messages: a batch as `(events, [event, node, change,
+    ...])`, the triples in event order, replying with the partition's histogram
+    deltas as the bytes of two arrays, `offsets` of each event's first pair and
+    the flat `deltas` pairs. Also ('load', nodes) replying with the whole
+    histogram as one event, 'nodes' for a copy of the partition, or None to stop.
+
+    """
+    nodes = {}
+    degree_dist = DegreeHistogram()
+    while True:
+        message = marshal.loads(conn.recv_bytes())
+        if message is None:
+            break
+        if message == 'nodes':
+            conn.send(nodes)
+            continue
+        if message[0] == 'load':
+            nodes = message[1]
+            degree_dist = DegreeHistogram()
+            for degree in nodes.itervalues():
+                degree_dist.move(0, degree)
+            deltas = array('l')
+            for degree, count in enumerate(degree_dist.counts):
+                if count:
+                    deltas.extend((degree, count))
+            conn.send((array('l', [0, len(deltas)]).tostring(), deltas.tostring()))
+            continue
+
+        events, requests = message
+        offsets, deltas = array('l', [0]), array('l')
+        counts = {} # degree: net change in nodes, this event
+        event = 0
+        try:
+            for i in xrange(0, len(requests), 3):
+                at, node, change = requests[i:i+3]
+                while event < at:
+                    _close_event(counts, deltas)
+                    offsets.append(len(deltas))
+                    event += 1
+                old = nodes.get(node, 0)
+                new = old + change
+                if old == 0 and change <= 0:
+                    raise ValueError('can not create new nodes with zero or negative values')
+                elif new < 0:
+                    raise ValueError('can not reduce a node degree below zero')
+                elif new == 0:
+                    del nodes[node]
+                else:
+                    nodes[node] = new
+                degree_dist.move(old, new)
+                if old:
+                    counts[old] = counts.get(old, 0) - 1
+                if new:
+                    counts[new] = counts.get(new, 0) + 1
+            while event < events:
+                _close_event(counts, deltas)
+                offsets.append(len(deltas))
+                event += 1
+            reply = (offsets.tostring(), deltas.tostring())
+        except ValueError as error:
+            reply = error
+        conn.send(reply)
+    conn.close()
+
+
+class PartitionedReducer(Reducer):
+    """Reducer whose nodes are hash partitioned over worker processes.
+
+    Args:
+        packed (bool): change keys are packed integer edge keys, see interner
+        partitions (int): number of worker processes
+        statistics list: quantiles, 'mean' and 'max' to report in place of the median
+
+    """
+
+    def __init__(self, packed=False, partitions=2, statistics=None):
+        self.degree_dist = DegreeHistogram()
+        self.packed = packed
+        self.statistics = statistics
+        self.dirty = True
+        self._median = None
+        self.partitions = partitions
+        self._conns = []
+        self._workers = []
+        for i in xrange(partitions):
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=partition_worker, args=(child,))
+            worker.daemon = True
+            worker.start()
+            child.close()
+            self._conns.append(parent)
+            self._workers.append(worker)
+
+
+    @property
+    def nodes(self):
+        """Gather the node degrees of all partitions, costly, for inspection and compaction."""
+        nodes = {}
+        self.send(self._conns, 'nodes')
+        for conn in self._conns:
+            nodes.update(conn.recv())
+        return nodes
+
+
+    def send(self, conns, message):
+        """Marshal a message to conns, far cheaper than pickling."""
+        message = marshal.dumps(message)
+        for conn in conns:
+            conn.send_bytes(message)
+
+
+    def exchange(self, conns, message):
+        """Send a message to conns, returning each partition's (offsets, deltas) arrays."""
+        self.send(conns, message)
+        return self.replies(conns)
+
+
+    def replies(self, conns):
+        """Receive each partition's (offsets, deltas) arrays, raising the first error once all replied."""
+        replies = []
+        errors = []
+        for conn in conns:
+            reply = conn.recv()
+            if isinstance(reply, ValueError):
+                errors.append(reply)
+                continue
+            offsets, deltas = array('l'), array('l')
+            offsets.fromstring(reply[0])
+            deltas.fromstring(reply[1])
+            replies.append((offsets, deltas))
+        if errors:
+            raise errors[0]
+        return replies
+
+
+    def dispatch(self, diffs):
+        """Split a batch of diffs by node hash, returning each partition's histogram deltas."""
+        partitions = self.partitions
+        requests = [[] for i in xrange(partitions)]
+        for event, changes in enumerate(diffs):
+            for key, change in changes.iteritems():
+                if change != 0:
+                    a, b = unpack_edge(key) if self.packed else key
+                    requests[hash(a) % partitions].extend((event, a, change))
+                    requests[hash(b) % partitions].extend((event, b, change))
+        for conn, request in zip(self._conns, requests):
+            self.send([conn], (len(diffs), request))
+        return self.replies(self._conns)
+
+
+    def merge(self, replies, events):
+        """Merge the partitions' histogram deltas in event order, returning the median after each event."""
+        merge = self.degree_dist.merge
+        medians = []
+        for event in xrange(events):
+            for offsets, deltas in replies:
+                start, stop = offsets[event], offsets[event+1]
+                if start != stop:
+                    merge(deltas, start, stop)
+                    self.dirty = True
+            medians.append(self.current())
+        return medians
+
+
+    def fold(self, replies):
+        """Merge all of the partitions' histogram deltas, deferring the median until asked for."""
+        for offsets, deltas in replies:
+            if len(deltas):
+                self.degree_dist.merge(deltas)
+                self.dirty = True
+
+
+    def upsert_node(self, node, val):
+        """Update, Insert, or Delete a node as needed."""
+        conn = self._conns[hash(node) % self.partitions]
+        self.fold(self.exchange([conn], (1, [0, node, val])))
+
+
+    def apply(self, changes):
+        """Apply changes to the partitions, deferring the median until asked for."""
+        self.fold(self.dispatch([changes]))
+
+
+    def apply_many(self, diffs):
+        """Update the partitions with a batch of diffs, merging their deltas into one median per diff."""
+        if not diffs:
+            return []
+        return self.merge(self.dispatch(diffs), len(diffs))
+
+
+    def load(self, nodes):
+        """Replace the partitions' nodes with node degrees, e.g. from a checkpoint."""
+        shares = [{} for i in xrange(self.partitions)]
+        for node, degree in nodes.iteritems():
+            shares[hash(node) % self.partitions][node] = degree
+        for conn, share in zip(self._conns, shares):
+            self.send([conn], ('load', share))
+        self.degree_dist = DegreeHistogram()
+        self.fold(self.replies(self._conns))
+        self.dirty = True
+
+
+    def median(self):
+        """Retrieve median degree from the merged distribution."""
+        log.debug("deg_dist(len:%i): %s", len(self.degree_dist), self.degree_dist)
+        return self.degree_dist.median()
+
+
+    def quantile(self, q):
+        return self.degree_dist.quantile(q)
+
+
+    def mean(self):
+        return self.degree_dist.mean()
+
+
+    def maximum(self):
+        return self.degree_dist.max
+
+
+    def close(self):
+        """Stop the partition workers."""
+        self.send(self._conns, None)
+        for worker in self._workers:
+            worker.join()
+        self._conns = []
+        self._workers = []
@@ -2,13 +2,44 @@
 
 import logging as log
 from blist import sortedlist
+from degree_histogram import DegreeHistogram
+from interner import unpack_edge
+
+
+STATISTICS = ('mean', 'max')
+
+
+def parse_statistics(value):
+    """Parse a comma separated list of quantiles in [0, 1], 'mean' and 'max'."""
+    statistics = []
+    for item in value.split(','):
+        item = item.strip()
+        if item not in STATISTICS:
+            item = float(item)
+            if not 0 <= item <= 1:
+                raise ValueError('quantiles must be within [0, 1]')
+        statistics.append(item)
+    return statistics
 
 
 class Reducer(object):
+    """Maintain node degrees and their sorted distribution.
 
-    def __init__(self):
+    Args:
+        packed (bool): change keys are packed integer edge keys, see interner
+        statistics list: quantiles, 'mean' and 'max' to report in place of the
+            median, see parse_statistics; None reports only the median
+
+    """
+
+    def __init__(self, packed=False, statistics=None):
         self.nodes = {}
         self.degree_dist = sortedlist()
+        self.degree_sum = 0
+        self.packed = packed
+        self.statistics = statistics
+        self.dirty = True # median needs recomputing
+        self._median = None
 
 
     def upsert_node(self, node, val):
@@ -16,6 +47,7 @@ class Reducer(object):
         try:                        
             self.degree_dist.remove(self.nodes[node])
             self.nodes[node] += val         
+            self.degree_sum += val
             
             if self.nodes[node] == 0:                
                 del self.nodes[node]
@@ -26,13 +58,14 @@ class Reducer(object):
             if val > 0: # only create entries for new nodes
                 self.nodes[node] = val
                 self.degree_dist.add(val)
+                self.degree_sum += val
             else:       
                 raise ValueError('can not create new nodes with zero or negative values')
                 
 
     def median(self):
         """Retrieve median degree from distribution."""
-        log.debug("deg_dist(len:%i): %s" % (len(self.degree_dist), self.degree_dist))
+        log.debug("deg_dist(len:%i): %s", len(self.degree_dist), self.degree_dist)
         length = len(self.degree_dist)
         if length % 2 == 0: # even
             index = (length / 2) - 1
@@ -42,12 +75,167 @@ class Reducer(object):
             return self.degree_dist[index]          
 
 
-    def update(self, changes):
-        """Update the node-cache."""
-        for (a, b), change in changes.iteritems():          
+    def quantile(self, q):
+        """Retrieve the q-th quantile degree, interpolating linearly between ranks."""
+        length = len(self.degree_dist)
+        if length == 0:
+            return 0.0
+        position = q * (length - 1)
+        index = int(position)
+        fraction = position - index
+        low = self.degree_dist[index]
+        if not fraction:
+            return float(low)
+        high = self.degree_dist[index + 1]
+        return low + (high - low) * fraction
+
+
+    def mean(self):
+        """Retrieve the mean degree."""
+        length = len(self.degree_dist)
+        return self.degree_sum / float(length) if length else 0.0
+
+
+    def maximum(self):
+        """Retrieve the max degree."""
+        return self.degree_dist[-1] if len(self.degree_dist) else 0
+
+
+    def summary(self):
+        """Retrieve the configured statistics, in order."""
+        values = []
+        for statistic in self.statistics:
+            if statistic == 'mean':
+                values.append(self.mean())
+            elif statistic == 'max':
+                values.append(self.maximum())
+            else:
+                values.append(self.quantile(statistic))
+        return tuple(values)
+
+
+    def apply(self, changes):
+        """Apply changes to the node-cache, deferring the median until asked for."""
+        if self.packed:
+            changes = ((unpack_edge(key), change) for key, change in changes.iteritems())
+        else:
+            changes = changes.iteritems()
+        for (a, b), change in changes:
             if change != 0:
                 self.upsert_node(a, change)
                 self.upsert_node(b, change)     
-        return self.median()
+                self.dirty = True
+
+
+    def edge_added(self, key):
+        """Count an edge entering the window, the cache's callback in place of a diff."""
+        a, b = unpack_edge(key) if self.packed else key
+        self.upsert_node(a, 1)
+        self.upsert_node(b, 1)
+        self.dirty = True
+
+
+    def edge_removed(self, key):
+        """Uncount an edge leaving the window."""
+        a, b = unpack_edge(key) if self.packed else key
+        self.upsert_node(a, -1)
+        self.upsert_node(b, -1)
+        self.dirty = True
+
+
+    def current(self):
+        """Retrieve the median, recomputing only if changes were applied since last asked."""
+        if self.dirty:
+            self._median = self.median() if self.statistics is None else self.summary()
+            self.dirty = False
+        return self._median
+
+
+    def update(self, changes):
+        """Update the node-cache."""
+        self.apply(changes)
+        return self.current()
+
+
+    def apply_many(self, diffs):
+        """Update the node-cache with a batch of diffs, one median per diff.
+
+        Empty diffs (duplicate or stale edges) re-use the previous median.
+
+        """
+        return [self.update(changes) for changes in diffs]
+
+
+    def load(self, nodes):
+        """Replace the node-cache with node degrees, e.g. from a checkpoint."""
+        self.nodes = dict(nodes)
+        self.degree_dist = sortedlist(self.nodes.itervalues())
+        self.degree_sum = sum(self.degree_dist)
+        self.dirty = True
+
+
+    def close(self):
+        """Release resources held by the reducer, if any."""
+        pass
+
+
+class HistogramReducer(Reducer):
+    """Drop-in Reducer keeping a degree histogram in place of a sorted list.
+
+    Degrees only ever move by small steps, so updates and median queries are
+    O(1) amortized rather than O(log n).
+
+    """
+
+    def __init__(self, packed=False, statistics=None):
+        Reducer.__init__(self, packed, statistics)
+        self.degree_dist = DegreeHistogram()
+
+
+    def upsert_node(self, node, val):
+        """Update, Insert, or Delete a node as needed."""
+        try:
+            old = self.nodes[node]
+        except KeyError:
+            if val > 0: # only create entries for new nodes
+                self.nodes[node] = val
+                self.degree_dist.move(0, val)
+                return
+            else:
+                raise ValueError('can not create new nodes with zero or negative values')
+
+        new = old + val
+        if new < 0:
+            raise ValueError('can not reduce a node degree below zero')
+        elif new == 0:
+            del self.nodes[node]
+        else:
+            self.nodes[node] = new
+        self.degree_dist.move(old, new)
+
+
+    def load(self, nodes):
+        """Replace the node-cache with node degrees, e.g. from a checkpoint."""
+        self.nodes = dict(nodes)
+        self.degree_dist = DegreeHistogram()
+        for degree in self.nodes.itervalues():
+            self.degree_dist.move(0, degree)
+        self.dirty = True
+
+
+    def median(self):
+        """Retrieve median degree from distribution."""
+        log.debug("deg_dist(len:%i): %s", len(self.degree_dist), self.degree_dist)
+        return self.degree_dist.median()
+
+
+    def quantile(self, q):
+        return self.degree_dist.quantile(q)
+
+
+    def mean(self):
+        return self.degree_dist.mean()
+
 
-            
\ No newline at end of file
+    def maximum(self):
+        return self.degree_dist.max
@@ -0,0 +1,83 @@
+"""Reorder buffers events for a bounded lateness, releasing them in time-stamp order.
+-----
+
+Producers running in parallel deliver events slightly out of order. The cache
+treats an event behind its window as stale and drops it, so the reorder stage
+holds events back until a watermark, the latest time-stamp seen less the
+allowed lateness, has passed them, and releases them in time-stamp order (ties
+in arrival order).
+
+An event arriving behind the watermark is too late to be reordered. It is
+counted and passed straight through, to be handled by the cache as today. With
+a lateness of 0 every event is released as it arrives, so the stream is
+unchanged.
+
+"""
+
+import heapq
+import logging as log
+from stats import NULL_STATS
+
+
+class ReorderBuffer(object):
+    """Min-heap of held events, keyed by time-stamp and arrival.
+
+    Args:
+        lateness (int): seconds an event may lag the latest time-stamp and still be reordered
+        stats (Stats): instrumentation, counts events arriving too late
+
+    """
+
+    def __init__(self, lateness=0, stats=NULL_STATS):
+        self.lateness = lateness
+        self.stats = stats
+        self.watermark = None
+        self.too_late = 0
+        self._heap = []
+        self._seq = 0 # arrival order, breaks time-stamp ties
+
+
+    def __len__(self):
+        return len(self._heap)
+
+
+    def push(self, edge, released):
+        """Hold an edge, appending edges the watermark has passed to released."""
+        timestamp = edge[2]
+        if self.watermark is not None and timestamp < self.watermark:
+            self.too_late += 1
+            self.stats.count('late_events')
+            log.debug("too late: %s behind watermark %i", edge, self.watermark)
+            released.append(edge)
+            return released
+
+        heap = self._heap
+        heapq.heappush(heap, (timestamp, self._seq, edge))
+        self._seq += 1
+        watermark = timestamp - self.lateness
+        if self.watermark is None or watermark > self.watermark:
+            self.watermark = watermark
+        while heap and heap[0][0] <= self.watermark:
+            released.append(heapq.heappop(heap)[2])
+        return released
+
+
+    def push_many(self, edges):
+        """Hold a batch of edges, returning those released, in order."""
+        released = []
+        for edge in edges:
+            self.push(edge, released)
+        return released
+
+
+    def flush(self):
+        """Release every held edge, at the end of the stream."""
+        heap = self._heap
+        return [heapq.heappop(heap)[2] for i in xrange(len(heap))]
+
+
+    def batches(self, batches):
+        """Reorder a stream of edge batches, yielding the released edges of each and a final flush."""
+        for edges in batches:
+            yield self.push_many(edges)
+        yield self.flush()
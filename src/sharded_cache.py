@@ -0,0 +1,401 @@
+"""ShardedCache spreads the edge cache across worker processes by edge key.
+-----
+
+Each worker owns the `Cache` of a hash shard of the packed edge keys, so the
+dedup and eviction upkeep of a large window is spread over the workers. The
+coordinator tracks the window's lower-bound exactly as a single cache would,
+a shared watermark: an event moving it past the window is broadcast to every
+shard as an advance, and each shard evicts its own expired edges. Edges behind
+the window are dropped before they are sent.
+
+Workers exchange fixed-width int64 records with the coordinator through
+single-producer, single-consumer ring buffers in shared memory, one inbox and
+one outbox per worker. A batch of events is sent as `(event, a, b, timestamp)`
+records, advances with `a = ADVANCE`, closed by an END record. Each worker
+streams back `(event, key, change)` records, 1 for an edge entering its shard of
+the window and 0 for one leaving it, then END. The coordinator merges the
+outboxes in event order, so the reducer sees the same changes, event by event,
+as from one `Cache`.
+
+Inboxes hold a whole batch, larger batches are split, so the coordinator never
+blocks sending. It drains each outbox in turn while the worker is still
+writing, so a full outbox only pauses its worker. Edges must be interned.
+
+On close, say after a failed exchange, a worker may be paused on a full outbox,
+or its inbox too full for the STOP record. The coordinator keeps draining the
+outboxes and offering STOP for a bounded time, then terminates what is left.
+
+"""
+
+import mmap
+import time
+import struct
+import multiprocessing
+
+from array import array
+from collections import defaultdict
+from edge_time_cache import Cache, hop, check_step
+from interner import pack_edge
+from stats import NULL_STATS
+
+
+END = -1 # closes a batch, or a gather reply
+GATHER = -2 # asks a worker for its live edges
+STOP = -3 # stops a worker
+ADVANCE = -1 # in the actor field, marks a window advance
+WAIT = 0.05 # seconds between re-checks of a ring, should a wake-up be missed
+CLOSE_TIMEOUT = 5.0 # seconds for workers to stop before they are terminated
+_COUNTERS = struct.Struct('=qq') # head, tail: records read and written
+_COUNTER = struct.Struct('=q')
+
+
+class Ring(object):
+    """Single-producer, single-consumer ring buffer of fixed-width int64 records in shared memory.
+
+    Created before the worker is forked, so both ends map the same memory. The
+    consumer always waits on the `readable` semaphore before reading, and the
+    producer releases it once per write, so readers see every record written
+    before the counters they read. Once a peer process is watched, a wait
+    which finds it exited raises a RuntimeError in place of waiting forever.
+
+    Args:
+        capacity (int): records held
+        width (int): int64 fields per record
+
+    """
+
+    def __init__(self, capacity, width):
+        self.capacity = capacity
+        self.width = width
+        self._itemsize = array('l').itemsize
+        self._memory = mmap.mmap(-1, _COUNTERS.size + capacity * width * self._itemsize)
+        self._readable = multiprocessing.Semaphore(0)
+        self._writable = multiprocessing.Semaphore(0)
+        self._peer = None
+        self._name = None
+
+
+    def watch(self, peer, name):
+        """Check that the peer process, named name in errors, is alive whenever a wait times out."""
+        self._peer = peer
+        self._name = name
+
+
+    def _check(self):
+        if self._peer is not None and not self._peer.is_alive():
+            raise RuntimeError('%s exited with code %s' % (self._name, self._peer.exitcode))
+
+
+    def _span(self, position, count):
+        """Byte range of count records from ring position, not wrapping."""
+        start = _COUNTERS.size + position * self.width * self._itemsize
+        return start, start + count * self.width * self._itemsize
+
+
+    def put(self, records, block=True):
+        """Write a flat array('l') of whole records, waiting for space as needed.
+
+        Without block, nothing is written unless all records fit at once.
+
+        Returns:
+            bool: whether the records were written
+
+        """
+        count = len(records) // self.width
+        if not block:
+            head, tail = _COUNTERS.unpack_from(self._memory, 0)
+            if self.capacity - (tail - head) < count:
+                return False
+        done = 0
+        while done < count:
+            head, tail = _COUNTERS.unpack_from(self._memory, 0)
+            free = self.capacity - (tail - head)
+            if free == 0:
+                if not self._writable.acquire(True, WAIT):
+                    self._check()
+                continue
+            position = tail % self.capacity
+            n = min(free, count - done, self.capacity - position)
+            start, end = self._span(position, n)
+            self._memory[start:end] = records[done * self.width:(done + n) * self.width].tostring()
+            # only tail is ours to write, the consumer moves head
+            _COUNTER.pack_into(self._memory, _COUNTER.size, tail + n)
+            self._readable.release()
+            done += n
+        return True
+
+
+    def get(self, block=True):
+        """Read every record written so far, waiting for at least one unless not block, as a flat array('l')."""
+        records = array('l')
+        while True:
+            woken = self._readable.acquire(block, WAIT)
+            head, tail = _COUNTERS.unpack_from(self._memory, 0)
+            if tail > head or not block:
+                break
+            if not woken:
+                self._check()
+        while head < tail:
+            position = head % self.capacity
+            n = min(tail - head, self.capacity - position)
+            start, end = self._span(position, n)
+            records.fromstring(self._memory[start:end])
+            head += n
+        # only head is ours to write, the producer moves tail
+        _COUNTER.pack_into(self._memory, 0, head)
+        self._writable.release()
+        return records
+
+
+class ShardSink(object):
+    """Buffer a shard's edge callbacks as outbox records for the current event."""
+
+    def __init__(self):
+        self.event = 0
+        self.records = array('l')
+
+
+    def edge_added(self, key):
+        self.records.extend((self.event, key, 1))
+
+
+    def edge_removed(self, key):
+        self.records.extend((self.event, key, 0))
+
+
+def shard_worker(inbox, outbox, size, step, wheel, flush=4096):
+    """Serve one shard of the edge cache, see the module docstring for the records."""
+    cache = Cache(size=size, step=step, wheel=wheel, packed=True)
+    sink  = ShardSink()
+    while True:
+        records = inbox.get()
+        for i in xrange(0, len(records), 4):
+            event, a, b, timestamp = records[i:i+4]
+            if event == STOP:
+                return
+            if event == END:
+                sink.records.extend((END, 0, 0))
+                outbox.put(sink.records)
+                sink.records = array('l')
+            elif event == GATHER:
+                for key, latest in cache.edges.iteritems():
+                    sink.records.extend((GATHER, key, latest))
+                sink.records.extend((END, 0, 0))
+                outbox.put(sink.records)
+                sink.records = array('l')
+            elif a == ADVANCE:
+                sink.event = event
+                delta = timestamp - cache.lower_bound
+                if delta >= cache.size:
+                    cache.update_lower_bound(timestamp)
+                    cache.evict_into(delta, sink)
+            else:
+                sink.event = event
+                cache.push((a, b, timestamp), sink)
+            if len(sink.records) >= 3 * flush:
+                outbox.put(sink.records)
+                sink.records = array('l')
+
+
+class ShardedCache(object):
+    """Drop-in Cache for interned edges, sharded over worker processes by edge key.
+
+    Args:
+        size (int): window length in seconds
+        step (int): seconds per hop of the lower-bound
+        shards (int): number of worker processes
+        wheel (int): buckets per timing-wheel slot in each shard, 0 disables
+        batch (int): most events sent per exchange, sizes the inboxes
+        ring (int): records held by each outbox
+        stats (Stats): instrumentation, counts window advances and evicted edges
+
+    """
+
+    def __init__(self, size=60, step=1, shards=2, wheel=0, batch=1024, ring=1 << 16, stats=NULL_STATS, **kwargs):
+        check_step(size, step)
+        self._size = size
+        self._step = step
+        self._lower_bound = 0
+        self.shards = shards
+        self.batch = batch
+        self.stats = stats
+        self._inboxes  = []
+        self._outboxes = []
+        self._workers  = []
+        for i in xrange(shards):
+            # every event may carry an advance and an edge, plus the END record
+            inbox, outbox = Ring(2 * batch + 1, 4), Ring(ring, 3)
+            worker = multiprocessing.Process(target=shard_worker, args=(inbox, outbox, size, step, wheel))
+            worker.daemon = True
+            worker.start()
+            inbox.watch(worker, 'shard %i worker' % i)
+            outbox.watch(worker, 'shard %i worker' % i)
+            self._inboxes.append(inbox)
+            self._outboxes.append(outbox)
+            self._workers.append(worker)
+
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def step(self):
+        return self._step
+
+    @property
+    def lower_bound(self):
+        return self._lower_bound
+
+    @property
+    def edges(self):
+        """Gather the live edges of all shards, costly, for inspection and stats."""
+        for inbox in self._inboxes:
+            inbox.put(array('l', (GATHER, 0, 0, 0)))
+        edges = {}
+        for records in self.replies():
+            for i in xrange(0, len(records), 3):
+                edges[records[i+1]] = records[i+2]
+        return edges
+
+
+    def dispatch(self, edges):
+        """Send a batch of interned edges to their shards, broadcasting window advances."""
+        size, step, shards = self._size, self._step, self.shards
+        lower_bound = self._lower_bound
+        requests = [array('l') for i in xrange(shards)]
+        for event, (a, b, timestamp) in enumerate(edges):
+            delta = timestamp - lower_bound
+            # Old, behind window, no shard holds it
+            if delta < 0:
+                continue
+            if delta >= size:
+                lower_bound = hop(timestamp - size + 1, step)
+                for request in requests:
+                    request.extend((event, ADVANCE, 0, timestamp))
+                self.stats.count('window_advances')
+            requests[hash(pack_edge(a, b)) % shards].extend((event, a, b, timestamp))
+        self._lower_bound = lower_bound
+        for inbox, request in zip(self._inboxes, requests):
+            request.extend((END, 0, 0, 0))
+            inbox.put(request)
+
+
+    def replies(self):
+        """Drain each outbox up to its END record, returning each shard's records without it."""
+        replies = []
+        for outbox in self._outboxes:
+            reply = array('l')
+            while True:
+                records = outbox.get()
+                if len(records) >= 3 and records[-3] == END:
+                    reply.extend(records[:-3])
+                    break
+                reply.extend(records)
+            replies.append(reply)
+        return replies
+
+
+    def exchange(self, edges):
+        """Run a batch through the shards, returning their (event, key, change) records."""
+        replies = []
+        for start in xrange(0, len(edges), self.batch):
+            self.dispatch(edges[start:start + self.batch])
+            for reply in self.replies():
+                # events are numbered per exchange, offset them into the whole batch
+                if start:
+                    for i in xrange(0, len(reply), 3):
+                        reply[i] += start
+                replies.append(reply)
+        return replies
+
+
+    def merge(self, replies, events, sink):
+        """Call sink with the shards' changes in event order, returning sink.current() after each event."""
+        positions = [0] * len(replies)
+        results = []
+        evicted = 0
+        for event in xrange(events):
+            for r, reply in enumerate(replies):
+                i = positions[r]
+                while i < len(reply) and reply[i] == event:
+                    if reply[i+2]:
+                        sink.edge_added(reply[i+1])
+                    else:
+                        sink.edge_removed(reply[i+1])
+                        evicted += 1
+                    i += 3
+                positions[r] = i
+            results.append(sink.current())
+        self.stats.count('evicted_edges', evicted)
+        return results
+
+
+    def push(self, edge, sink):
+        """Update the shards with an edge, calling sink with each edge entering or leaving the window."""
+        self.merge(self.exchange([edge]), 1, sink)
+
+
+    def push_many(self, edges, sink):
+        """Push a batch of edges into sink, returning sink.current() after each edge."""
+        return self.merge(self.exchange(edges), len(edges), sink)
+
+
+    def update(self, edge):
+        """Update the shards with an edge, returning its diff."""
+        return self.update_many([edge])[0]
+
+
+    def update_many(self, edges):
+        """Update the shards with a batch of edges, returning one diff per edge as Cache does."""
+        diffs = [defaultdict(int) for edge in edges]
+        self.merge(self.exchange(edges), len(edges), DiffSink(diffs))
+        return diffs
+
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """Stop the shard workers, terminating any still running after timeout seconds.
+
+        Outboxes are drained meanwhile, replies discarded, so no worker stays
+        paused on a full one before it reads its STOP record.
+
+        """
+        stop = array('l', (STOP, 0, 0, 0))
+        stopped = [False] * self.shards
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            running = False
+            for i, worker in enumerate(self._workers):
+                if not worker.is_alive():
+                    continue
+                running = True
+                if not stopped[i]:
+                    stopped[i] = self._inboxes[i].put(stop, block=False)
+                self._outboxes[i].get(block=False)
+            if not running:
+                break
+            time.sleep(WAIT / 10)
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+
+class DiffSink(object):
+    """Collect merged changes into per-event diffs, for `ShardedCache.update_many`."""
+
+    def __init__(self, diffs):
+        self.diffs = diffs
+        self.event = 0
+
+
+    def edge_added(self, key):
+        self.diffs[self.event][key] += 1
+
+
+    def edge_removed(self, key):
+        self.diffs[self.event][key] -= 1
+
+
+    def current(self):
+        self.event += 1
@@ -0,0 +1,151 @@
+"""Stats instruments the pipeline with per-stage timings, counters and gauges.
+-----
+
+Stages are timed per batch, not per event, so instrumentation stays cheap. A
+snapshot is dumped as one json object per line, every `every` seconds of wall
+time and once more at exit, for example
+
+    {"elapsed": 10.0, "final": false, "stages": {"map": 4.1, ...},
+     "counters": {"events": 120000, ...}, "gauges": {"live_edges": 5310, ...}}
+
+When stats are disabled the pipeline is handed NULL_STATS, whose methods do nothing.
+
+"""
+
+import sys
+import time
+import json
+
+from collections import defaultdict
+
+
+class _Stage(object):
+    """Context manager adding its elapsed time to a stage."""
+
+    __slots__ = ('seconds', 'name', 'start')
+
+    def __init__(self, seconds, name):
+        self.seconds = seconds
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, *exc):
+        self.seconds[self.name] += time.time() - self.start
+
+
+class _NullStage(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+class Stats(object):
+    """Collect stage timings, counters and gauges, dumping them as json lines.
+
+    Args:
+        stream (file): where snapshots are written
+        every (float): seconds of wall time between snapshots, 0 only dumps at exit
+
+    """
+
+    enabled = True
+
+    def __init__(self, stream=sys.stderr, every=10.0):
+        self.stream = stream
+        self.every = every
+        self.seconds = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self._start = self._last = time.time()
+
+
+    def stage(self, name):
+        """Time a block as part of stage `name`."""
+        return _Stage(self.seconds, name)
+
+
+    def add(self, name, seconds):
+        self.seconds[name] += seconds
+
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+
+    def snapshot(self, final=False):
+        return {
+            'elapsed': time.time() - self._start,
+            'final': final,
+            'stages': dict(self.seconds),
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+        }
+
+
+    def due(self):
+        """Whether a periodic snapshot is due."""
+        return self.every and time.time() - self._last >= self.every
+
+
+    def dump(self, final=False):
+        self._last = time.time()
+        self.stream.write(json.dumps(self.snapshot(final), sort_keys=True) + '\n')
+        self.stream.flush()
+
+
+class NullStats(object):
+    """Stand-in for Stats when instrumentation is off."""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def add(self, name, seconds):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def gauge(self, name, value):
+        pass
+
+    def due(self):
+        return False
+
+    def dump(self, final=False):
+        pass
+
+
+NULL_STATS = NullStats()
+
+
+class TimedWriter(object):
+    """File-like wrapper timing writes and flushes as the 'write' stage."""
+
+    def __init__(self, stream, stats):
+        self.stream = stream
+        self.seconds = stats.seconds
+
+    def write(self, data):
+        start = time.time()
+        self.stream.write(data)
+        self.seconds['write'] += time.time() - start
+
+    def flush(self):
+        start = time.time()
+        self.stream.flush()
+        self.seconds['write'] += time.time() - start
+
+    def tell(self):
+        return self.stream.tell()
@@ -0,0 +1,43 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data-gen'))
+
+from benchmark import TARGETS, percentiles, regressions, benchmark
+from engines import ENGINES
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_percentiles(self):
+        result = percentiles(range(100, 0, -1))
+        self.assertEquals(result, {'p50': 50, 'p90': 90, 'p99': 99, 'p99.9': 100, 'max': 100})
+        self.assertEquals(percentiles([7]), {'p50': 7, 'p90': 7, 'p99': 7, 'p99.9': 7, 'max': 7})
+        self.assertEquals(percentiles([1, 2, 3, 4])['p50'], 2)
+
+
+    def test_regressions(self):
+        baseline = {'results': {'a': {'events_per_sec': 1000}, 'b': {'events_per_sec': 1000}}}
+        report = {'results': {'a': {'events_per_sec': 850}, 'b': {'events_per_sec': 950},
+                              'c': {'events_per_sec': 1}}}
+        failures = regressions(report, baseline, 0.1)
+        # b is within tolerance, c has no baseline
+        self.assertEquals(len(failures), 1)
+        self.assertTrue(failures[0].startswith('a:'))
+        self.assertEquals(regressions(report, baseline, 0.2), [])
+
+
+    def test_engines(self):
+        for name in ENGINES:
+            self.assertEquals(TARGETS['engine-%s' % name], ['median_degree.py', '--engine', name])
+
+        path = os.path.join(os.path.dirname(__file__), 'data/large/input.txt')
+        report = benchmark(path, ['engine-histogram'], 60, latency_limit=100, engines=['histogram', 'library'])
+        self.assertEquals(report['stream']['events'], 1792)
+        self.assertTrue(report['results']['engine-histogram']['events_per_sec'] > 0)
+        self.assertEquals(sorted(report['latency_us']), ['histogram', 'library'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import checkpoint
+from edge_time_cache import Cache
+from reducer import Reducer, HistogramReducer
+from interner import Interner
+from collector import Collector, emit
+from mapper import json_to_edge
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        base_dir = os.path.dirname(__file__)
+        with open(os.path.join(base_dir, 'data/large/input.txt'), 'r') as stream:
+            self.edges = [json_to_edge(raw) for raw in stream]
+        with open(os.path.join(base_dir, 'data/large/output.txt'), 'r') as stream:
+            self.expect = stream.read().splitlines()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def assert_resume(self, reducer_type, interner=None, split=900):
+        cache   = Cache(packed=interner is not None)
+        reducer = reducer_type(packed=interner is not None)
+        edges   = self.edges[:split]
+        if interner is not None:
+            edges = [interner.intern_edge(edge) for edge in edges]
+        medians = reducer.apply_many(cache.update_many(edges))
+        if interner is not None:
+            interner.compact(reducer.nodes)
+        collector = Collector(StringIO(), changes_only=True)
+        collector.collect(medians[-1])
+        checkpoint.save(self.directory, cache, reducer, interner, collector, events=split)
+
+        header, sections = checkpoint.load(self.directory)
+        self.assertEquals(header['events'], split)
+        cache     = Cache(packed=interner is not None)
+        reducer   = reducer_type(packed=interner is not None)
+        collector = Collector(StringIO(), changes_only=True)
+        interner  = checkpoint.restore(header, sections, cache, reducer, collector, packed=interner is not None)
+        self.assertEquals(collector.last, self.expect[split - 1])
+
+        edges = self.edges[split:]
+        if interner is not None:
+            edges = [interner.intern_edge(edge) for edge in edges]
+        medians.extend(reducer.apply_many(cache.update_many(edges)))
+        self.assertEquals([emit(median) for median in medians], self.expect)
+
+
+    def test_resume(self):
+        self.assert_resume(Reducer)
+
+
+    def test_resume_histogram(self):
+        self.assert_resume(HistogramReducer, split=1)
+
+
+    def test_resume_interned(self):
+        self.assert_resume(HistogramReducer, Interner())
+
+
+    def test_resume_numeric_names(self):
+        ids = {}
+        self.edges = [(ids.setdefault(actor, len(ids)), ids.setdefault(target, len(ids)), time)
+                      for actor, target, time in self.edges]
+        self.assert_resume(Reducer)
+        self.assert_resume(HistogramReducer, Interner())
+
+
+    def test_window_mismatch(self):
+        checkpoint.save(self.directory, Cache(size=30), Reducer())
+        header, sections = checkpoint.load(self.directory)
+        with self.assertRaises(ValueError):
+            checkpoint.restore(header, sections, Cache(size=60), Reducer())
+
+
+    def test_intern_mismatch(self):
+        interner = Interner()
+        cache, reducer = Cache(packed=True), HistogramReducer(packed=True)
+        reducer.apply_many(cache.update_many([interner.intern_edge(edge) for edge in self.edges[:100]]))
+        checkpoint.save(self.directory, cache, reducer, interner)
+        header, sections = checkpoint.load(self.directory)
+        with self.assertRaises(ValueError):
+            checkpoint.restore(header, sections, Cache(), HistogramReducer())
+
+        checkpoint.save(self.directory, Cache(), Reducer())
+        header, sections = checkpoint.load(self.directory)
+        with self.assertRaises(ValueError):
+            checkpoint.restore(header, sections, Cache(packed=True), Reducer(packed=True), packed=True)
+
+
+    def test_missing_directory(self):
+        directory = os.path.join(self.directory, 'a', 'b')
+        checkpoint.save(directory, Cache(), Reducer())
+        self.assertTrue(os.path.exists(checkpoint.checkpoint_path(directory)))
+
+
+if __name__ == '__main__':
+    unittest.main()
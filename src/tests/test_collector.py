@@ -0,0 +1,107 @@
+import unittest
+from StringIO import StringIO
+from collector import Collector, emit, emit_columns, emit_period, _format
+
+
+class MockReducer(object):
+
+    def __init__(self):
+        self.value = 1
+        self.calls = 0
+
+    def current(self):
+        self.calls += 1
+        return self.value
+
+
+class TestCollector(unittest.TestCase):
+
+    def setUp(self):
+        self.outfile = StringIO()
+        self.reducer = MockReducer()
+
+
+    def test_emit(self):
+        self.assertEquals(emit(1), '1.00')
+        self.assertEquals(emit(1.5), '1.50')
+        self.assertEquals(emit(2.0), '2.00')
+        self.assertEquals(emit(0.0), '0.00')
+
+
+    def test_emit_table(self):
+        for half in xrange(2048):
+            self.assertEquals(emit(half / 2.0), _format(half / 2.0))
+        self.assertEquals(emit(1.25), _format(1.25))
+        self.assertEquals(emit(2.675), _format(2.675))
+
+
+    def test_emit_columns(self):
+        self.assertEquals(emit_columns((1, 2.5)), '1.00 2.50')
+        self.assertEquals(emit_columns(((1, 4.25), (2, 3))), '1.00 4.25 2.00 3.00')
+
+
+    def test_emit_period(self):
+        self.assertEquals(emit_period('event'), 0)
+        self.assertEquals(emit_period('second'), 1)
+        self.assertEquals(emit_period('10'), 10)
+        self.assertEquals(emit_period('10s'), 10)
+        with self.assertRaises(ValueError):
+            emit_period('0')
+
+
+    def test_collect(self):
+        collector = Collector(self.outfile)
+        self.assertEquals(collector.collect(1), '1.00')
+        self.assertEquals(collector.collect(1), '1.00')
+        self.assertEquals(self.outfile.getvalue(), '1.00\n1.00\n')
+
+
+    def test_buffer(self):
+        collector = Collector(self.outfile, buffer=3)
+        for value in [1, 1.5]:
+            collector.collect(value)
+        self.assertEquals(self.outfile.getvalue(), '')
+        collector.collect(2)
+        self.assertEquals(self.outfile.getvalue(), '1.00\n1.50\n2.00\n')
+        collector.collect(3)
+        collector.close(self.reducer)
+        self.assertEquals(self.outfile.getvalue(), '1.00\n1.50\n2.00\n3.00\n')
+
+
+    def test_changes_only(self):
+        collector = Collector(self.outfile, changes_only=True)
+        for value in [1, 1, 1.5, 1.5, 1]:
+            collector.collect(value)
+        self.assertEquals(self.outfile.getvalue(), '1.00\n1.50\n1.00\n')
+
+
+    def test_observe(self):
+        collector = Collector(self.outfile, period=10)
+        for timestamp in [100, 101, 109, 105]:
+            collector.observe(timestamp, self.reducer)
+        self.assertEquals(self.reducer.calls, 0)
+
+        collector.observe(110, self.reducer)
+        self.reducer.value = 2
+        collector.observe(135, self.reducer)
+        collector.observe(101, self.reducer) # late event
+        self.reducer.value = 1.5
+        collector.close(self.reducer)
+
+        self.assertEquals(self.reducer.calls, 3)
+        # lines carry their period's start, 120 was skipped by the gap
+        self.assertEquals(self.outfile.getvalue(), '100 1.00\n110 2.00\n130 1.50\n')
+
+
+    def test_observe_changes_only(self):
+        collector = Collector(self.outfile, period=10, changes_only=True)
+        for timestamp in [100, 110, 120]:
+            collector.observe(timestamp, self.reducer)
+        self.reducer.value = 2
+        collector.observe(130, self.reducer)
+        collector.close(self.reducer)
+        self.assertEquals(self.outfile.getvalue(), '100 1.00\n120 2.00\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
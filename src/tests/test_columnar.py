@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+
+from columnar import ColumnarReader, convert, names_path
+from mapper import json_to_edge
+
+
+# Disable logging
+logging.disable(logging.CRITICAL)
+
+
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(os.path.dirname(__file__), 'data/large/input.txt')
+        self.path = os.path.join(self.directory, 'input.col')
+        with open(self.source, 'r') as stream:
+            self.edges = [json_to_edge(raw) for raw in stream]
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_round_trip(self):
+        self.assertEquals(convert(self.source, self.path), len(self.edges))
+        self.assertTrue(os.path.exists(names_path(self.path)))
+
+        reader = ColumnarReader(self.path)
+        try:
+            self.assertEquals(len(reader), len(self.edges))
+            names = reader.names
+            edges = []
+            for batch in reader.batches(100):
+                self.assertTrue(len(batch) <= 100)
+                edges.extend((names[a], names[b], timestamp) for a, b, timestamp in batch)
+            self.assertEquals(edges, self.edges)
+
+            actors, targets, timestamps = reader.columns(10, 20)
+            self.assertEquals(actors.typecode, 'i')
+            self.assertEquals(timestamps.typecode, 'l')
+            self.assertEquals(list(timestamps), [edge[2] for edge in self.edges[10:20]])
+        finally:
+            reader.close()
+
+
+    def test_not_columnar(self):
+        with self.assertRaises(ValueError):
+            ColumnarReader(self.source)
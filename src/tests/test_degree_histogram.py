@@ -0,0 +1,115 @@
+import random
+import unittest
+from degree_histogram import DegreeHistogram
+
+
+class TestDegreeHistogram(unittest.TestCase):
+
+    def setUp(self):
+        self.hist = DegreeHistogram()
+
+
+    def median(self, degrees):
+        dist = sorted(degrees)
+        length = len(dist)
+        if length == 0:
+            return 0.0
+        if length % 2 == 0:
+            return (dist[length // 2 - 1] + dist[length // 2]) / 2.0
+        return dist[(length - 1) // 2]
+
+
+    def quantile(self, degrees, q):
+        dist = sorted(degrees)
+        if not dist:
+            return 0.0
+        position = q * (len(dist) - 1)
+        index = int(position)
+        if index + 1 >= len(dist):
+            return float(dist[index])
+        return dist[index] + (dist[index + 1] - dist[index]) * (position - index)
+
+
+    def test_empty(self):
+        self.assertEquals(self.hist.median(), 0.0)
+        self.assertEquals(len(self.hist), 0)
+
+
+    def test_move(self):
+        self.hist.move(0, 1)
+        self.hist.move(0, 3)
+        self.assertEquals(self.hist.counts[1], 1)
+        self.assertEquals(self.hist.counts[3], 1)
+        self.assertEquals(list(self.hist), [1, 3])
+        self.assertEquals(self.hist.median(), 2.0)
+
+        self.hist.move(3, 0)
+        self.assertEquals(len(self.hist), 1)
+        self.assertEquals(self.hist.median(), 1)
+
+
+    def test_random_walk(self):
+        rand = random.Random(42)
+        degrees = {}
+        for i in xrange(5000):
+            node = rand.randint(0, 200)
+            old = degrees.get(node, 0)
+            new = max(0, old + rand.choice([-1, 1, 1]))
+            if new:
+                degrees[node] = new
+            else:
+                degrees.pop(node, None)
+            self.hist.move(old, new)
+            self.assertEquals(self.hist.median(), self.median(degrees.values()))
+
+
+    def test_statistics(self):
+        rand = random.Random(7)
+        degrees = {}
+        for i in xrange(3000):
+            node = rand.randint(0, 100)
+            old = degrees.get(node, 0)
+            new = max(0, old + rand.choice([-2, -1, 1, 1, 3]))
+            if new:
+                degrees[node] = new
+            else:
+                degrees.pop(node, None)
+            self.hist.move(old, new)
+            values = degrees.values()
+            for q in [0, 0.5, 0.9, 0.99, 1]:
+                self.assertAlmostEquals(self.hist.quantile(q), self.quantile(values, q))
+            self.assertEquals(self.hist.quantile(0.5), self.median(values))
+            self.assertEquals(self.hist.max, max(values) if values else 0)
+            self.assertAlmostEquals(self.hist.mean(), sum(values) / float(len(values)) if values else 0.0)
+
+
+    def test_merge(self):
+        rand = random.Random(3)
+        degrees = {}
+        for i in xrange(2000):
+            # a few moves at a time, merged as net count deltas
+            counts = {}
+            for j in xrange(rand.randint(1, 4)):
+                node = rand.randint(0, 100)
+                old = degrees.get(node, 0)
+                new = max(0, old + rand.choice([-1, 1, 1, 2]))
+                if new:
+                    degrees[node] = new
+                else:
+                    degrees.pop(node, None)
+                if old:
+                    counts[old] = counts.get(old, 0) - 1
+                if new:
+                    counts[new] = counts.get(new, 0) + 1
+            deltas = [0, 0] # skipped by start
+            for degree, delta in counts.iteritems():
+                deltas.extend((degree, delta))
+            self.hist.merge(deltas, 2)
+            values = degrees.values()
+            self.assertEquals(self.hist.median(), self.median(values))
+            self.assertAlmostEquals(self.hist.quantile(0.9), self.quantile(values, 0.9))
+            self.assertEquals(self.hist.max, max(values) if values else 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
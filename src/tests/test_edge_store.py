@@ -0,0 +1,95 @@
+import os
+import random
+import unittest
+import logging
+
+from edge_time_cache import Cache
+from edge_store import EdgeStore, ArrayCache
+from interner import Interner
+from reducer import HistogramReducer
+from mapper import json_to_edge
+
+
+# Disable logging
+logging.disable(logging.CRITICAL)
+
+
+class TestEdgeStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = EdgeStore()
+
+
+    def test_insert_find_remove(self):
+        entry = self.store.insert(7 << 32 | 3, 100)
+        self.assertEquals(self.store.find(7 << 32 | 3), entry)
+        self.assertEquals(self.store.find(3 << 32 | 7), -1)
+        self.assertEquals(self.store[7 << 32 | 3], 100)
+        self.assertEquals(len(self.store), 1)
+
+        self.store.remove(entry)
+        self.assertEquals(self.store.find(7 << 32 | 3), -1)
+        self.assertEquals(len(self.store), 0)
+        # freed entries are reused
+        self.assertEquals(self.store.insert(1, 101), entry)
+
+
+    def test_resize(self):
+        rand = random.Random(3)
+        expect = {}
+        for i in xrange(20000):
+            key = rand.randrange(5000) << 32 | rand.randrange(5000)
+            entry = self.store.find(key)
+            if entry >= 0 and rand.random() < 0.5:
+                self.store.remove(entry)
+                del expect[key]
+            elif entry < 0:
+                self.store.insert(key, i)
+                expect[key] = i
+        self.assertEquals(len(self.store), len(expect))
+        self.assertEquals(dict(self.store.iteritems()), expect)
+        for key in expect:
+            self.assertTrue(key in self.store)
+
+
+class TestArrayCache(unittest.TestCase):
+
+    def assert_same_diffs(self, edges, size=60):
+        cache, expect = ArrayCache(size=size), Cache(size=size, packed=True)
+        for edge in edges:
+            self.assertEquals(dict(cache.update(edge)), dict(expect.update(edge)))
+        self.assertEquals(dict(cache.edges.iteritems()), expect.edges)
+
+        # the callbacks of push match the diffs
+        pushed, expect = ArrayCache(size=size), Cache(size=size, packed=True)
+        medians = HistogramReducer(packed=True).apply_many(expect.update_many(edges))
+        self.assertEquals(pushed.push_many(edges, HistogramReducer(packed=True)), medians)
+        self.assertEquals(dict(pushed.edges.iteritems()), expect.edges)
+
+
+    def test_fixture(self):
+        base_dir = os.path.dirname(__file__)
+        interner = Interner()
+        with open(os.path.join(base_dir, 'data/large/input.txt'), 'r') as stream:
+            edges = [interner.intern_edge(json_to_edge(raw)) for raw in stream]
+        self.assert_same_diffs(edges)
+
+
+    def test_late_edges(self):
+        rand = random.Random(5)
+        edges = []
+        for i in xrange(5000):
+            timestamp = 1000 + i // 20 - (rand.randint(0, 20) if rand.random() < 0.2 else 0)
+            edges.append((rand.randrange(60), rand.randrange(60), timestamp))
+        self.assert_same_diffs(edges, size=10)
+
+
+    def test_load(self):
+        cache = ArrayCache(size=60)
+        cache.load({1 << 32 | 2: 100, 2 << 32 | 3: 130}, lower_bound=91, head=5)
+        self.assertEquals(len(cache.edges), 2)
+        self.assertEquals(dict(cache.update((4, 5, 160))), {1 << 32 | 2: -1, 4 << 32 | 5: 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 
+import random
 import unittest
 from edge_time_cache import Cache
 
@@ -50,7 +51,128 @@ class TestCache(unittest.TestCase):
         self.cache.truncate(n)
         self.assertEquals( len(cache), size)
         self.assertEquals(hits(mock_edge), 0)
-        
+        self.assertEquals(self.cache.head, n)
+
+
+    def test_truncate_wraps(self):
+        cache = self.cache.cache
+        self.cache.truncate(50)
+        self.cache.observe_edge(0, ('a','b'), 1)
+        self.cache.observe_edge(20, ('c','d'), 21)
+        self.assertIn(('a','b'), cache[50])
+        self.assertIn(('c','d'), cache[10])
+
+        expired = self.cache.truncate(15)
+        self.assertEquals(expired, [('a','b')])
+        self.assertEquals(self.cache.head, 5)
+        self.assertIn(('c','d'), cache[10])
+
+
+    def test_wheel(self):
+        rand  = random.Random(7)
+        plain = Cache(size=90)
+        wheel = Cache(size=90, wheel=8)
+        timestamp = 1000000000
+        for i in xrange(3000):
+            timestamp += rand.choice([0, 0, 1, 2, 45, 200])
+            edge = (rand.randint(0, 50), rand.randint(0, 50), timestamp - rand.randint(0, 80))
+            self.assertEquals(plain.update(edge), wheel.update(edge))
+        self.assertEquals(plain.edges, wheel.edges)
+
+
+    def test_wheel_sparse(self):
+        # a day long window, bursts separated by gaps of up to several windows
+        rand  = random.Random(9)
+        plain = Cache(size=86400, step=60)
+        wheel = Cache(size=86400, step=60, wheel=4)
+        timestamp = 1000000000
+        for i in xrange(600):
+            timestamp += rand.choice([0, 1, 30, 3600, 50000, 200000])
+            edge = (rand.randint(0, 30), rand.randint(0, 30), timestamp - rand.randint(0, 90000))
+            self.assertEquals(plain.update(edge), wheel.update(edge))
+            self.assertEquals(plain.edges, wheel.edges)
+        self.assertEquals(wheel._slots, sum(1 << slot for slot, count in enumerate(wheel._occupied) if count))
+
+
+    def test_step(self):
+        rand  = random.Random(11)
+        cache = Cache(size=60, step=7)
+        lower_bound, edges = 0, {}
+        timestamp = 1000000000
+        for i in xrange(3000):
+            timestamp += rand.choice([0, 0, 1, 2, 9, 70])
+            a, b, t = rand.randint(0, 50), rand.randint(0, 50), timestamp - rand.randint(0, 50)
+            # naive hopping window, as in control.py
+            if t - lower_bound >= 60:
+                lower_bound = -(-(t - 60 + 1) // 7) * 7
+                edges = dict((k, v) for k, v in edges.iteritems() if v >= lower_bound)
+            if t >= lower_bound:
+                key = cache.lexed_key(a, b)
+                edges[key] = max(t, edges.get(key, t))
+            cache.update((a, b, t))
+            self.assertEquals(cache.lower_bound % 7, 0)
+            self.assertEquals(cache.edges, edges)
+        self.assertEquals(len(cache.cache), 9)
+
+
+    def test_step_past_window(self):
+        # a hop longer than the window would move the lower-bound past the event advancing it
+        with self.assertRaises(ValueError):
+            Cache(size=7, step=10)
+        with self.assertRaises(ValueError):
+            Cache(size=7, step=0)
+        cache = Cache(size=7, step=7)
+        for timestamp in (100, 108, 109, 120):
+            cache.update(('a', str(timestamp), timestamp))
+            self.assertTrue(cache.lower_bound <= timestamp)
+            self.assertIn(cache.lexed_key('a', str(timestamp)), cache.edges)
+
+
+    def test_update_many(self):
+        edges = [('a','b',100), ('b','c',100), ('a','b',100), ('c','d',130),
+                 ('a','b',50), ('d','e',170), ('b','a',171)]
+        single = Cache()
+        expect = [single.update(edge) for edge in edges]
+        self.assertEquals(self.cache.update_many(edges), expect)
+
+        # ('b','c') is evicted at 170, ('a','b') is evicted then re-added
+        net = Cache().update_many(edges, net=True)
+        self.assertEquals(dict((k, v) for k, v in net.iteritems() if v),
+            {('c','d'): 1, ('d','e'): 1, ('a','b'): 1})
+
+
+
+    def test_push(self):
+        rand  = random.Random(5)
+        edges = []
+        timestamp = 1000000000
+        for i in xrange(2000):
+            timestamp += rand.choice([0, 0, 1, 3, 40])
+            edges.append((rand.randint(0, 30), rand.randint(0, 30), timestamp - rand.randint(0, 20)))
+
+        for options in [{}, {'step': 7}, {'wheel': 4}]:
+            diffs, pushed = Cache(**options), Cache(**options)
+            sink = Sink()
+            for edge in edges:
+                expect = dict((k, v) for k, v in diffs.update(edge).iteritems() if v)
+                sink.changes = {}
+                pushed.push(edge, sink)
+                self.assertEquals(dict((k, v) for k, v in sink.changes.iteritems() if v), expect)
+                self.assertEquals(pushed.edges, diffs.edges)
+
+
+class Sink(object):
+    """Record the callbacks of Cache.push as a diff."""
+
+    def __init__(self):
+        self.changes = {}
+
+    def edge_added(self, key):
+        self.changes[key] = self.changes.get(key, 0) + 1
+
+    def edge_removed(self, key):
+        self.changes[key] = self.changes.get(key, 0) - 1
+
 
     # def test_update(self):
     #   cache = self.cache
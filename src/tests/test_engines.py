@@ -0,0 +1,88 @@
+import os
+import unittest
+import logging
+
+from array import array
+from engines import ENGINES, NaiveEngine, MedianDegreeEngine
+from interner import Interner
+from mapper import json_to_edge
+from collector import emit
+
+
+# Disable logging
+logging.disable(logging.CRITICAL)
+
+
+class TestEngines(unittest.TestCase):
+
+    def setUp(self):
+        base_dir =  os.path.dirname(__file__)
+        with open(os.path.join(base_dir, 'data/large/input.txt'), 'r') as stream:
+            self.edges = [json_to_edge(raw) for raw in stream]
+        with open(os.path.join(base_dir, 'data/large/output.txt'), 'r') as stream:
+            self.expect = [line.rstrip() for line in stream]
+
+
+    def test_naive(self):
+        engine = NaiveEngine()
+        self.assertEquals([emit(engine.push(edge)) for edge in self.edges], self.expect)
+
+
+    def test_registered(self):
+        for name, engine_type in sorted(ENGINES.items()):
+            engine = engine_type(window=60)
+            try:
+                results = engine.push_many(self.edges[:500]) + engine.push_many(self.edges[500:])
+            finally:
+                engine.close()
+            self.assertEquals([emit(result) for result in results], self.expect, name)
+
+
+    def test_step(self):
+        naive = NaiveEngine(window=30, step=7)
+        expect = [emit(naive.push(edge)) for edge in self.edges]
+        for name, engine_type in sorted(ENGINES.items()):
+            engine = engine_type(window=30, step=7)
+            try:
+                results = engine.push_many(self.edges)
+            finally:
+                engine.close()
+            self.assertEquals([emit(result) for result in results], expect, name)
+            self.assertEquals(len(engine.edges), len(naive.edges), name)
+
+
+    def test_step_past_window(self):
+        for name, engine_type in sorted(ENGINES.items()):
+            with self.assertRaises(ValueError):
+                engine_type(window=7, step=10)
+
+
+    def test_columns(self):
+        interner = Interner()
+        actors, targets, timestamps = array('l'), array('l'), array('l')
+        for edge in self.edges:
+            a, b, timestamp = interner.intern_edge(edge)
+            actors.append(a)
+            targets.append(b)
+            timestamps.append(timestamp)
+
+        engine = MedianDegreeEngine(window=60)
+        out = array('d', [0.0]) * 1000
+        medians = []
+        for start in xrange(0, len(timestamps), 1000):
+            end = start + 1000
+            result = engine.push_columns(actors[start:end], targets[start:end], timestamps[start:end], out)
+            self.assertIs(result, out)
+            medians.extend(out[:len(timestamps[start:end])])
+        self.assertEquals([emit(median) for median in medians], self.expect)
+
+        with self.assertRaises(ValueError):
+            engine.push_columns(actors, targets, timestamps, out)
+
+
+    def test_push(self):
+        engine = MedianDegreeEngine(window=60, intern=True)
+        self.assertEquals(emit(engine.push(self.edges[0])), self.expect[0])
+        medians = engine.push_many(self.edges[1:])
+        self.assertIsInstance(medians, array)
+        self.assertEquals([emit(median) for median in medians], self.expect[1:])
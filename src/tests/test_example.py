@@ -2,7 +2,7 @@ import os
 import unittest
 import logging
 
-from median_degree import Cache, Reducer, json_to_edge, emit
+from median_degree import Cache, Reducer, HistogramReducer, Interner, json_to_edge, emit
 
 
 # Disable logging
@@ -20,13 +20,28 @@ class TestExample(unittest.TestCase):
 
 
     def test_example(self):     
-        cache   = Cache()
-        reducer = Reducer()
+        self.assert_pipeline(Reducer())
+
+
+    def test_example_histogram(self):
+        self.assert_pipeline(HistogramReducer())
+
+
+    def test_example_interned(self):
+        self.assert_pipeline(HistogramReducer(packed=True), Interner())
+
+
+    def assert_pipeline(self, reducer, interner=None):
+        cache   = Cache(packed=interner is not None)
 
         for raw in self.stream:         
             edge   = json_to_edge(raw) # Map, raw to tuple/edge representation          
+            if interner is not None:
+                edge = interner.intern_edge(edge)
             diff   = cache.update(edge) # Partition, updates by cache bucket        
             result = reducer.update(diff) # Reduce, updates into one value per input event              
+            if interner is not None:
+                interner.compact(reducer.nodes)
             degree = emit(result) # Collect, output
 
             expect = self.expect.readline().strip(os.linesep)
@@ -0,0 +1,54 @@
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data-gen'))
+
+from generate import generate, power_law
+
+
+class TestGenerate(unittest.TestCase):
+
+    def test_seed(self):
+        self.assertEquals(list(generate(2000, seed=5)), list(generate(2000, seed=5)))
+        self.assertNotEquals(list(generate(2000, seed=5)), list(generate(2000, seed=6)))
+
+
+    def test_duplicates(self):
+        # uniform over many users, so fresh edges almost never repeat by chance
+        edges = list(generate(20000, users=10 ** 6, skew=0, duplicates=0.2, late=0, seed=1))
+        seen, repeats = set(), 0
+        for actor, target, timestamp in edges:
+            if (actor, target) in seen:
+                repeats += 1
+            seen.add((actor, target))
+        self.assertAlmostEqual(repeats / 20000.0, 0.2, delta=0.02)
+
+
+    def test_late(self):
+        start, rate = 1000, 10
+        edges = list(generate(20000, rate=rate, duplicates=0, late=0.05, lateness=30, start=start, seed=2))
+        lags = [start + int(i / float(rate)) - timestamp for i, (actor, target, timestamp) in enumerate(edges)]
+        self.assertTrue(all(0 <= lag <= 30 for lag in lags))
+        self.assertAlmostEqual(sum(1 for lag in lags if lag) / 20000.0, 0.05, delta=0.01)
+
+
+    def test_power_law(self):
+        rand = random.Random(3)
+        counts = [0] * 1000
+        for i in xrange(100000):
+            counts[power_law(rand, 1000, 1.2)] += 1
+        # density x^-skew over [1, users + 1), rank r takes the mass of [r + 1, r + 2)
+        mass = lambda r: (r + 1) ** -0.2 - (r + 2) ** -0.2
+        self.assertAlmostEqual(counts[0] / float(counts[1]), mass(0) / mass(1), delta=0.1)
+        self.assertAlmostEqual(counts[0] / float(counts[9]), mass(0) / mass(9), delta=1.0)
+
+        uniform = [0] * 10
+        for i in xrange(20000):
+            uniform[power_law(rand, 10, 0)] += 1
+        self.assertTrue(min(uniform) > 1700)
+
+
+if __name__ == '__main__':
+    unittest.main()
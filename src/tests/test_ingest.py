@@ -0,0 +1,106 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from StringIO import StringIO
+from ingest import Ingest, StreamSink, parse_address
+
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = ['{"event": %i}\n' % i for i in xrange(100)]
+
+
+    def collect(self, ingest, size=16):
+        lines = []
+        for batch in ingest.batches(size):
+            self.assertLessEqual(len(batch), size)
+            lines.extend(batch)
+        return lines
+
+
+    def produce(self, family, address, lines):
+        client = socket.socket(family, socket.SOCK_STREAM)
+        client.connect(address)
+        client.sendall(''.join(lines))
+        client.close()
+
+
+    def test_parse_address(self):
+        self.assertEquals(parse_address('tcp://localhost:9000'), (socket.AF_INET, ('localhost', 9000)))
+        self.assertEquals(parse_address('tcp://:0'), (socket.AF_INET, ('127.0.0.1', 0)))
+        self.assertEquals(parse_address('unix:///tmp/sock'), (socket.AF_UNIX, '/tmp/sock'))
+        with self.assertRaises(ValueError):
+            parse_address('/tmp/sock')
+
+
+    def test_stream(self):
+        ingest = Ingest(maxsize=4) # producer blocks on the small queue
+        ingest.add_stream(StringIO(''.join(self.lines)))
+        self.assertEquals(self.collect(ingest), self.lines)
+
+
+    def test_tail(self):
+        handle, path = tempfile.mkstemp()
+        stream = os.fdopen(handle, 'w')
+        stream.write(''.join(self.lines[:50]) + self.lines[50][:5])
+        stream.flush()
+
+        ingest = Ingest()
+        ingest.add_tail(path, poll=0.01, idle=0.5)
+
+        def grow():
+            stream.write(self.lines[50][5:] + ''.join(self.lines[51:]))
+            stream.close()
+        writer = threading.Timer(0.1, grow)
+        writer.start()
+        try:
+            self.assertEquals(self.collect(ingest), self.lines)
+        finally:
+            writer.join()
+            os.unlink(path)
+
+
+    def test_tcp_producers(self):
+        ingest = Ingest(maxsize=8)
+        ingest.add_server('tcp://127.0.0.1:0', producers=2)
+        producers = [threading.Thread(target=self.produce,
+                        args=(socket.AF_INET, ingest.address, self.lines[i::2])) for i in (0, 1)]
+        for producer in producers:
+            producer.start()
+        lines = self.collect(ingest)
+        for producer in producers:
+            producer.join()
+
+        self.assertEquals(sorted(lines), sorted(self.lines))
+        # each producer's lines keep their order
+        self.assertEquals([line for line in lines if line in self.lines[0::2]], self.lines[0::2])
+
+
+    def test_unix_producer(self):
+        path = os.path.join(tempfile.mkdtemp(), 'ingest.sock')
+        ingest = Ingest()
+        ingest.add_server('unix://' + path, producers=1)
+        producer = threading.Thread(target=self.produce, args=(socket.AF_UNIX, path, self.lines))
+        producer.start()
+        try:
+            self.assertEquals(self.collect(ingest), self.lines)
+        finally:
+            producer.join()
+            os.unlink(path)
+            os.rmdir(os.path.dirname(path))
+
+
+    def test_sink(self):
+        outfile = StringIO()
+        sink = StreamSink(outfile, maxsize=2)
+        for line in self.lines:
+            sink.write(line)
+        sink.close()
+        self.assertEquals(outfile.getvalue(), ''.join(self.lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
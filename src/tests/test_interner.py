@@ -0,0 +1,43 @@
+import unittest
+from interner import Interner, pack_edge, unpack_edge
+
+
+class TestInterner(unittest.TestCase):
+
+    def setUp(self):
+        self.interner = Interner()
+
+
+    def test_intern(self):
+        self.assertEquals(self.interner.intern('a'), 0)
+        self.assertEquals(self.interner.intern('b'), 1)
+        self.assertEquals(self.interner.intern('a'), 0)
+        self.assertEquals(self.interner.name(1), 'b')
+        self.assertEquals(len(self.interner), 2)
+
+
+    def test_intern_edge(self):
+        edge = self.interner.intern_edge(('a', 'b', 100))
+        self.assertEquals(edge, (0, 1, 100))
+
+
+    def test_pack_edge(self):
+        self.assertEquals(pack_edge(3, 7), pack_edge(7, 3))
+        self.assertEquals(unpack_edge(pack_edge(7, 3)), (3, 7))
+        self.assertEquals(unpack_edge(pack_edge(2**32 - 1, 0)), (0, 2**32 - 1))
+
+        self.interner.intern_edge(('b', 'a', 0))
+        self.assertEquals(self.interner.edge_names(pack_edge(1, 0)), ('b', 'a'))
+
+
+    def test_compact(self):
+        for name in 'abcd':
+            self.interner.intern(name)
+        released = self.interner.compact(set([1, 3]))
+        self.assertEquals(released, 2)
+        self.assertEquals(len(self.interner), 2)
+        self.assertEquals(self.interner.intern('b'), 1)
+        self.assertIsNone(self.interner.names[0])
+
+        # released ids are reused
+        self.assertIn(self.interner.intern('e'), (0, 2))
@@ -0,0 +1,34 @@
+import os
+import unittest
+from mapper import json_to_edge
+from map_pool import MapPool, map_batch, read_batches
+
+
+class TestMapPool(unittest.TestCase):
+
+    def setUp(self):
+        base_dir = os.path.dirname(__file__)
+        with open(os.path.join(base_dir, 'data/large/input.txt'), 'r') as stream:
+            self.lines = stream.readlines()
+        self.expect = [json_to_edge(raw) for raw in self.lines]
+
+
+    def test_read_batches(self):
+        batches = list(read_batches(iter(self.lines), 500))
+        self.assertEquals([len(batch) for batch in batches], [500, 500, 500, 292])
+
+
+    def test_map_batch(self):
+        self.assertEquals(map_batch(self.lines), self.expect)
+
+
+    def test_imap_order(self):
+        with MapPool(3, inflight=2) as pool:
+            mapped = []
+            for edges in pool.imap(read_batches(iter(self.lines), 37)):
+                mapped.extend(edges)
+        self.assertEquals(mapped, self.expect)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 
+import calendar
 import unittest
 import mapper
 
+from datetime import datetime
+
 
 class TestMapper(unittest.TestCase):
 
@@ -10,10 +13,69 @@ class TestMapper(unittest.TestCase):
         self.assertEqual(result, 1459217117)
         with self.assertRaises(ValueError):
             mapper.parse_time_string("2016-03-09T02:13:17.0123Z")
+        self.assertEqual(mapper.parse_time_string(None), 0)
+
+
+    def test_parse_fixed_time(self):
+        for string, expect in [("1970-01-01T00:00:00Z", 0), ("1999-12-31T23:59:59Z", 946684799),
+                               ("2000-02-29T12:00:00Z", 951825600), ("2016-02-29T23:59:59Z", 1456790399),
+                               ("2016-03-29T02:05:17Z", 1459217117), ("2038-01-19T03:14:08Z", 2147483648)]:
+            self.assertEqual(calendar.timegm(datetime.strptime(string, "%Y-%m-%dT%H:%M:%SZ").timetuple()), expect)
+            self.assertEqual(mapper.parse_fixed_time(string), expect)
+            self.assertEqual(mapper.parse_fixed_time(string), expect) # memoized
+
+        for string in ["2016-02-30T00:00:00Z", "2016-03-29T24:05:17Z",
+                       "2016-03-29T02:60:17Z", "2016-03-29 02:05:17Z", "2016-3-29T02:05:17Z"]:
+            with self.assertRaises(ValueError):
+                mapper.parse_fixed_time(string)
+
+
+    def test_parse_time_strict(self):
+        # strptime fallback accepts unpadded fields, strict mode does not
+        self.assertEqual(mapper.parse_time_string("2016-3-29T2:05:17Z"), 1459217117)
+        with self.assertRaises(ValueError):
+            mapper.parse_time_string("2016-3-29T2:05:17Z", strict=True)
+        with self.assertRaises(ValueError):
+            mapper.parse_time_string(None, strict=True)
+        self.assertEqual(mapper.parse_time_string("2016-03-29T02:05:17Z", strict=True), 1459217117)
 
 
     def test_json_to_edge(self):
         json = '{"created_time": "2016-03-29T02:15:39Z", "target": "target_a", "actor": "actor_b"}'
         expect = (u'actor_b',u'target_a',1459217739)
         result = mapper.json_to_edge(json)
-        self.assertEqual(result, expect)
\ No newline at end of file
+        self.assertEqual(result, expect)
+
+    def test_scan_edge(self):
+        expect = (u'actor_b', u'target_a', 1459217739)
+        for line in ['{"created_time": "2016-03-29T02:15:39Z", "target": "target_a", "actor": "actor_b"}\n',
+                     '{"actor":"actor_b","note":"x","target":"target_a","created_time":"2016-03-29T02:15:39Z"}',
+                     '{"actor": "nobody", "created_time": "2016-03-29T02:15:39Z", "target": "target_a", "actor": "actor_b"}']:
+            self.assertEqual(mapper.scan_edge(line), expect)
+            self.assertEqual(mapper.json_to_edge(line), expect)
+
+        # unusual lines are left to a full decode
+        for line in ['{"created_time": "2016-03-29T02:15:39Z", "target": "target_a", "actor": "actor_\\"b\\""}',
+                     '{"meta": {"actor": "x"}, "created_time": "2016-03-29T02:15:39Z", "target": "target_a", "actor": "actor_b"}',
+                     '{"created_time": "2016-03-29T02:15:39Z", "target": "target_a", "actor": null}',
+                     '{"created_time": "2016-03-29T02:15:39Z", "target": "target_a"}',
+                     '{"created_time": "2016-03-29T02:15:39Z", "target": "target_a", "actor": "actor_b"']:
+            self.assertIsNone(mapper.scan_edge(line))
+
+        line = '{"created_time": "2016-03-29T02:15:39Z", "target": "caf\xc3\xa9", "actor": "actor_b"}'
+        self.assertEqual(mapper.scan_edge(line), (u'actor_b', u'caf\xe9', 1459217739))
+
+
+    def test_json_to_edges(self):
+        note = 'x' * mapper.SCAN_MIN_LENGTH
+        lines = ['{"created_time": "2016-03-29T02:15:39Z", "target": "a", "actor": "b"}\n',
+                 '{"created_time": "2016-03-29T02:15:39Z", "target": "c", "actor": "b"}\n',
+                 '{"note": "%s", "created_time": "2016-03-29T02:15:40Z", "target": "a", "actor": "c"}\n' % note,
+                 '{"created_time": "2016-03-29T02:15:40Z", "target": "d", "actor": "a\\u00e9"}\n',
+                 '{"target": "d", "actor": "a"}\n']
+        self.assertEqual(mapper.json_to_edges(lines), [mapper.json_to_edge(line) for line in lines])
+        self.assertEqual(mapper.json_to_edges(lines)[2], (u'c', u'a', 1459217740))
+        self.assertEqual(mapper.json_to_edges(lines)[4], (u'a', u'd', 0))
+        self.assertEqual(mapper.json_to_edges([]), [])
+        with self.assertRaises(ValueError):
+            mapper.json_to_edges(lines + ['{"created_time": "2016-03-29T02:15:40Z",\n'])
@@ -0,0 +1,60 @@
+import os
+import unittest
+import logging
+
+from edge_time_cache import Cache
+from reducer import HistogramReducer
+from multi_window import MultiWindowCache, MultiReducer
+from mapper import json_to_edge
+
+
+# Disable logging
+logging.disable(logging.CRITICAL)
+
+
+class TestMultiWindow(unittest.TestCase):
+
+    def setUp(self):
+        base_dir = os.path.dirname(__file__)
+        with open(os.path.join(base_dir, 'data/large/input.txt'), 'r') as stream:
+            self.edges = [json_to_edge(raw) for raw in stream]
+
+
+    def medians(self, size):
+        cache   = Cache(size=size)
+        reducer = HistogramReducer()
+        return reducer.apply_many(cache.update_many(self.edges))
+
+
+    def test_columns(self):
+        sizes   = [60, 5, 200]
+        cache   = MultiWindowCache(sizes)
+        reducer = MultiReducer([HistogramReducer() for size in sizes], largest=2)
+        rows    = reducer.apply_many(cache.update_many(self.edges))
+        for w, size in enumerate(sizes):
+            self.assertEquals([row[w] for row in rows], self.medians(size))
+
+
+    def test_late_edges(self):
+        cache = MultiWindowCache([2, 10])
+        self.assertEquals(map(dict, cache.update(('a', 'b', 100))), [{('a', 'b'): 1}] * 2)
+        self.assertEquals(map(dict, cache.update(('b', 'c', 105))),
+            [{('a', 'b'): -1, ('b', 'c'): 1}, {('b', 'c'): 1}])
+        # behind the small window only
+        self.assertEquals(map(dict, cache.update(('a', 'b', 103))), [{}, {}])
+        self.assertEquals(map(dict, cache.update(('c', 'd', 101))), [{}, {('c', 'd'): 1}])
+        # small window evicts b-c, large window evicts c-d, a-b was refreshed at 103
+        self.assertEquals(map(dict, cache.update(('d', 'e', 112))),
+            [{('b', 'c'): -1, ('d', 'e'): 1}, {('c', 'd'): -1, ('d', 'e'): 1}])
+        self.assertEquals(sorted(cache.edges), [('a', 'b'), ('b', 'c'), ('d', 'e')])
+
+
+    def test_step_past_window(self):
+        # the step must fit the smallest window
+        with self.assertRaises(ValueError):
+            MultiWindowCache([30, 7], step=10)
+        MultiWindowCache([30, 7], step=7)
+
+
+if __name__ == '__main__':
+    unittest.main()
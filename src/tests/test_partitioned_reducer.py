@@ -0,0 +1,60 @@
+import os
+import unittest
+import test_reducer
+from partitioned_reducer import PartitionedReducer
+from median_degree import Cache, json_to_edge, emit
+
+
+class TestPartitionedReducer(test_reducer.TestReducer):
+
+    def setUp(self):
+        self.reduce = PartitionedReducer(partitions=3)
+
+
+    def tearDown(self):
+        self.reduce.close()
+
+
+    def test_insert_node(self):
+        self.reduce.upsert_node('a', 1)
+        self.assertEquals(self.reduce.nodes['a'], 1)
+
+        self.reduce.upsert_node('b', 1)
+        self.assertEquals(len(self.reduce.nodes), 2)
+
+
+    def test_update_node(self):
+        self.reduce.upsert_node('a', 1)
+        self.reduce.upsert_node('a', 1)
+        self.assertEquals(self.reduce.nodes['a'], 2)
+
+        self.reduce.upsert_node('a', -2)
+        self.assertNotIn('a', self.reduce.nodes)
+
+
+    def test_load(self):
+        nodes = dict(('n%i' % i, 1 + i % 5) for i in xrange(101))
+        self.reduce.load(nodes)
+        self.assertEquals(self.reduce.nodes, nodes)
+        self.assertEquals(self.reduce.current(), sorted(nodes.values())[50])
+        self.assertEquals(self.reduce.degree_dist.max, 5)
+
+        self.reduce.load({})
+        self.assertEquals(self.reduce.current(), 0.0)
+
+
+    def test_large(self):
+        base_dir = os.path.dirname(__file__)
+        with open(os.path.join(base_dir, 'data/large/input.txt'), 'r') as stream:
+            edges = [json_to_edge(raw) for raw in stream]
+        with open(os.path.join(base_dir, 'data/large/output.txt'), 'r') as stream:
+            expect = stream.read().splitlines()
+
+        diffs   = Cache().update_many(edges)
+        medians = self.reduce.apply_many(diffs[:1000])
+        medians.extend(self.reduce.update(diff) for diff in diffs[1000:])
+        self.assertEquals([emit(median) for median in medians], expect)
+
+
+if __name__ == '__main__':
+    unittest.main()
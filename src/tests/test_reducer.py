@@ -1,6 +1,17 @@
 
 import unittest
-from reducer import Reducer
+from reducer import Reducer, HistogramReducer, parse_statistics
+
+
+class TestParseStatistics(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEquals(parse_statistics('0.5,0.99, mean,max'), [0.5, 0.99, 'mean', 'max'])
+        with self.assertRaises(ValueError):
+            parse_statistics('1.5')
+        with self.assertRaises(ValueError):
+            parse_statistics('p90')
+
 
 
 class TestReducer(unittest.TestCase):
@@ -55,4 +66,57 @@ class TestReducer(unittest.TestCase):
         self.assertEqual(len(self.reduce.nodes), 11)        
         with self.assertRaises(KeyError):
             self.reduce.nodes['f']
-        
+
+
+    def test_apply_many(self):
+        diffs = [{('a','b'): 1}, {}, {('b','c'): 1}, {('a','b'): 0}, {('a','b'): -1}]
+        self.assertEquals(self.reduce.apply_many(diffs), [1, 1, 1, 1, 1])
+        self.assertEquals(len(self.reduce.nodes), 2)
+        self.assertEquals(self.reduce.apply_many([{}]), [1])
+
+
+    def test_edge_callbacks(self):
+        self.reduce.edge_added(('a','b'))
+        self.reduce.edge_added(('b','c'))
+        self.assertEquals(self.reduce.nodes, {'a': 1, 'b': 2, 'c': 1})
+        self.assertEquals(self.reduce.current(), 1)
+        self.reduce.edge_removed(('a','b'))
+        self.assertTrue(self.reduce.dirty)
+        self.assertEquals(self.reduce.nodes, {'b': 1, 'c': 1})
+        with self.assertRaises(ValueError):
+            self.reduce.edge_removed(('a','d'))
+
+
+    def test_lazy_median(self):
+        self.reduce.apply({('a','b'): 1, ('c','d'): 1})
+        self.assertTrue(self.reduce.dirty)
+        self.assertEquals(self.reduce.current(), 1)
+        self.assertFalse(self.reduce.dirty)
+
+        self.reduce.apply({('a','c'): 0})
+        self.assertFalse(self.reduce.dirty)
+        self.reduce.apply({('a','c'): 1})
+        self.assertEquals(self.reduce.current(), 1.5)
+
+
+    def test_statistics(self):
+        self.reduce.statistics = [0.5, 0.9, 'mean', 'max']
+        self.reduce.apply({('a','b'): 1, ('a','c'): 1, ('a','d'): 1, ('e','f'): 1})
+        # degrees 1, 1, 1, 1, 1, 3
+        self.assertEquals(self.reduce.current(), (1.0, 2.0, 8 / 6.0, 3))
+        self.reduce.apply({('a','b'): -1, ('a','c'): -1, ('a','d'): -1})
+        self.assertEquals(self.reduce.current(), (1.0, 1.0, 1.0, 1))
+        self.reduce.apply({('e','f'): -1})
+        self.assertEquals(self.reduce.current(), (0.0, 0.0, 0.0, 0))
+
+
+class TestHistogramReducer(TestReducer):
+
+    def setUp(self):
+        self.reduce = HistogramReducer()
+
+
+    def test_negative_degree(self):
+        self.reduce.upsert_node('a', 1)
+        with self.assertRaises(ValueError):
+            self.reduce.upsert_node('a', -2)
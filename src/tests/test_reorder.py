@@ -0,0 +1,38 @@
+import unittest
+from reorder import ReorderBuffer
+
+
+class TestReorderBuffer(unittest.TestCase):
+
+    def test_reorder(self):
+        reorder = ReorderBuffer(lateness=5)
+        edges = [('a', 'b', 100), ('b', 'c', 103), ('c', 'd', 101), ('d', 'e', 106), ('e', 'f', 102)]
+        self.assertEquals(reorder.push_many(edges), [('a', 'b', 100), ('c', 'd', 101)])
+        self.assertEquals(reorder.watermark, 101)
+        self.assertEquals(len(reorder), 3)
+        self.assertEquals(reorder.flush(), [('e', 'f', 102), ('b', 'c', 103), ('d', 'e', 106)])
+        self.assertEquals(reorder.too_late, 0)
+
+
+    def test_too_late(self):
+        reorder = ReorderBuffer(lateness=2)
+        self.assertEquals(reorder.push_many([('a', 'b', 110), ('b', 'c', 105)]), [('b', 'c', 105)])
+        self.assertEquals(reorder.too_late, 1)
+        self.assertEquals(reorder.flush(), [('a', 'b', 110)])
+
+
+    def test_zero_lateness(self):
+        edges = [('a', 'b', 100), ('b', 'c', 99), ('c', 'd', 100), ('d', 'e', 104), ('e', 'f', 90)]
+        reorder = ReorderBuffer(lateness=0)
+        self.assertEquals(list(reorder.batches([edges[:2], edges[2:]])), [edges[:2], edges[2:], []])
+        self.assertEquals(reorder.too_late, 2)
+
+
+    def test_ties_keep_arrival_order(self):
+        reorder = ReorderBuffer(lateness=1)
+        edges = [('a', 'b', 100), ('b', 'c', 100), ('a', 'c', 100)]
+        self.assertEquals(reorder.push_many(edges) + reorder.flush(), edges)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import time
+import random
+import unittest
+import logging
+
+from array import array
+from sharded_cache import Ring, ShardedCache
+from edge_time_cache import Cache
+from reducer import HistogramReducer
+from interner import Interner
+from mapper import json_to_edge
+
+
+# Disable logging
+logging.disable(logging.CRITICAL)
+
+
+class TestRing(unittest.TestCase):
+
+    def test_wraps(self):
+        ring = Ring(capacity=5, width=2)
+        ring.put(array('l', [1, 2, 3, 4, 5, 6]))
+        self.assertEquals(list(ring.get()), [1, 2, 3, 4, 5, 6])
+        # wraps past the end of the buffer
+        ring.put(array('l', [7, 8, 9, 10, 11, 12, -1, -2]))
+        self.assertEquals(list(ring.get()), [7, 8, 9, 10, 11, 12, -1, -2])
+
+
+    def test_nonblocking(self):
+        ring = Ring(capacity=2, width=1)
+        self.assertEquals(list(ring.get(block=False)), [])
+        self.assertTrue(ring.put(array('l', [1]), block=False))
+        self.assertFalse(ring.put(array('l', [2, 3]), block=False))
+        self.assertEquals(list(ring.get(block=False)), [1])
+
+
+class TestShardedCache(unittest.TestCase):
+
+    def setUp(self):
+        base_dir = os.path.dirname(__file__)
+        interner = Interner()
+        with open(os.path.join(base_dir, 'data/large/input.txt'), 'r') as stream:
+            self.edges = [interner.intern_edge(json_to_edge(raw)) for raw in stream]
+
+
+    def assert_same_diffs(self, edges, size=60, step=1, **kwargs):
+        cache, expect = ShardedCache(size=size, step=step, **kwargs), Cache(size=size, step=step, packed=True)
+        try:
+            for diff, other in zip(cache.update_many(edges), expect.update_many(edges)):
+                self.assertEquals(dict((k, v) for k, v in diff.iteritems() if v),
+                                  dict((k, v) for k, v in other.iteritems() if v))
+            self.assertEquals(cache.edges, expect.edges)
+            self.assertEquals(cache.lower_bound, expect.lower_bound)
+        finally:
+            cache.close()
+
+
+    def test_fixture(self):
+        # small batches and outboxes, so exchanges are split and workers wait on the coordinator
+        self.assert_same_diffs(self.edges, shards=3, batch=100, ring=16)
+
+
+    def test_step(self):
+        rand = random.Random(3)
+        edges = []
+        for i in xrange(3000):
+            timestamp = 1000 + i // 10 - (rand.randint(0, 30) if rand.random() < 0.2 else 0)
+            edges.append((rand.randrange(40), rand.randrange(40), timestamp))
+        self.assert_same_diffs(edges, size=30, step=7, shards=2)
+
+
+    def test_push_many(self):
+        cache = ShardedCache(size=60, shards=2)
+        try:
+            medians = cache.push_many(self.edges, HistogramReducer(packed=True))
+        finally:
+            cache.close()
+        expect = HistogramReducer(packed=True).apply_many(Cache(packed=True).update_many(self.edges))
+        self.assertEquals(medians, expect)
+
+
+    def test_dead_worker(self):
+        cache = ShardedCache(size=60, shards=2)
+        try:
+            cache._workers[1].terminate()
+            cache._workers[1].join()
+            with self.assertRaises(RuntimeError) as context:
+                cache.update_many(self.edges[:100])
+            self.assertIn('shard 1', str(context.exception))
+        finally:
+            cache.close()
+
+
+    def test_close_full_outbox(self):
+        # replies never read, so each worker pauses on its small outbox with input left
+        cache = ShardedCache(size=60, shards=2, batch=1000, ring=4)
+        cache.dispatch(self.edges[:1000])
+        start = time.time()
+        cache.close(timeout=10)
+        self.assertLess(time.time() - start, 5)
+        self.assertFalse(any(worker.is_alive() for worker in cache._workers))
+        self.assertEquals([worker.exitcode for worker in cache._workers], [0, 0])
+
+
+    def test_close_terminates(self):
+        cache = ShardedCache(size=60, shards=2, batch=1000, ring=4)
+        cache.dispatch(self.edges[:1000])
+        cache.close(timeout=0)
+        self.assertFalse(any(worker.is_alive() for worker in cache._workers))
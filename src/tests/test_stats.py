@@ -0,0 +1,59 @@
+import json
+import unittest
+from StringIO import StringIO
+from stats import Stats, NullStats, TimedWriter
+from edge_time_cache import Cache
+
+
+class TestStats(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = StringIO()
+        self.stats = Stats(self.stream, every=0)
+
+
+    def test_stage(self):
+        with self.stats.stage('map'):
+            pass
+        with self.stats.stage('map'):
+            pass
+        self.assertEquals(self.stats.seconds.keys(), ['map'])
+        self.assertTrue(self.stats.seconds['map'] >= 0)
+
+
+    def test_dump(self):
+        self.stats.count('events', 3)
+        self.stats.count('events')
+        self.stats.gauge('live_edges', 2)
+        self.assertFalse(self.stats.due())
+        self.stats.dump(final=True)
+        snapshot = json.loads(self.stream.getvalue())
+        self.assertEquals(snapshot['counters'], {'events': 4})
+        self.assertEquals(snapshot['gauges'], {'live_edges': 2})
+        self.assertTrue(snapshot['final'])
+
+
+    def test_null_stats(self):
+        stats = NullStats()
+        with stats.stage('map'):
+            stats.count('events')
+        self.assertFalse(stats.enabled)
+        self.assertFalse(stats.due())
+
+
+    def test_timed_writer(self):
+        writer = TimedWriter(self.stream, self.stats)
+        writer.write('1.00\n')
+        writer.flush()
+        self.assertEquals(self.stream.getvalue(), '1.00\n')
+        self.assertEquals(writer.tell(), 5)
+        self.assertTrue('write' in self.stats.seconds)
+
+
+    def test_cache_evictions(self):
+        cache = Cache(size=60, stats=self.stats)
+        cache.update(('a', 'b', 100))
+        advances = self.stats.counters['window_advances']
+        cache.update(('b', 'c', 170))
+        self.assertEquals(self.stats.counters['window_advances'], advances + 1)
+        self.assertEquals(self.stats.counters['evicted_edges'], 1)
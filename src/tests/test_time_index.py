@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+
+from time_index import TimeIndex, TimeRange, parse_bound, open_range, index_path
+
+
+# Disable logging
+logging.disable(logging.CRITICAL)
+
+
+LINE = '{"created_time": "2016-03-28T23:%02d:%02dZ", "target": "a%i", "actor": "b%i"}\n'
+
+
+class TestTimeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'input.txt')
+        # one event per second from 23:01:00, every 10th one 30s late
+        with open(self.path, 'w') as stream:
+            for i in xrange(600):
+                second = 60 + (i - 30 if i % 10 == 9 else i)
+                stream.write(LINE % (second // 60, second % 60, i % 7, i % 11))
+        self.start = 1459206060 # 2016-03-28T23:01:00Z
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_parse_bound(self):
+        self.assertEquals(parse_bound('1459206060'), self.start)
+        self.assertEquals(parse_bound('2016-03-28T23:01:00Z'), self.start)
+        with self.assertRaises(ValueError):
+            parse_bound('yesterday')
+
+
+    def test_build(self):
+        index = TimeIndex.build(self.path, every=100)
+        self.assertEquals(len(index), 6)
+        self.assertEquals(index.offsets[0], 0)
+        self.assertEquals(list(index.latest), [-1] + [self.start + i * 100 - 2 for i in xrange(1, 6)])
+        with open(self.path, 'rb') as stream:
+            stream.seek(index.offsets[3])
+            self.assertTrue(stream.readline().startswith('{"created_time": "2016-03-28T23:06:00Z"'))
+
+
+    def test_seek(self):
+        index = TimeIndex.build(self.path, every=100)
+        self.assertEquals(index.seek(self.start), 0)
+        self.assertEquals(index.seek(self.start + 298), index.offsets[2])
+        self.assertEquals(index.seek(self.start + 299), index.offsets[3])
+
+
+    def test_open(self):
+        index = TimeIndex.open(self.path, every=100)
+        self.assertTrue(os.path.exists(index_path(self.path)))
+        loaded = TimeIndex.load(self.path)
+        self.assertEquals(loaded.latest, index.latest)
+        self.assertEquals(loaded.offsets, index.offsets)
+
+        with open(self.path, 'a') as stream:
+            stream.write(LINE % (10, 0, 1, 2))
+        self.assertEquals(TimeIndex.load(self.path), None)
+
+
+    def test_open_directory(self):
+        directory = os.path.join(self.directory, 'index')
+        os.mkdir(directory)
+        index = TimeIndex.open(self.path, every=100, directory=directory)
+        self.assertTrue(os.path.exists(os.path.join(directory, 'input.txt.tidx')))
+        self.assertFalse(os.path.exists(index_path(self.path)))
+        self.assertEquals(TimeIndex.load(self.path, directory).offsets, index.offsets)
+
+
+    def test_open_unwritable(self):
+        # a file in place of the index directory, unwritable even to root
+        index = TimeIndex.open(self.path, every=100, directory=self.path)
+        self.assertEquals(len(index), 6)
+        self.assertEquals(TimeIndex.load(self.path), None)
+
+
+    def test_open_range(self):
+        lines = list(open_range(self.path, self.start + 400, 60, every=100))
+        self.assertEquals(len(lines), 300)
+        self.assertEquals(len(list(open_range(self.path, None, 60))), 600)
+
+
+class TestTimeRange(unittest.TestCase):
+
+    def test_clip(self):
+        time_range = TimeRange(start=105, stop=110)
+        self.assertEquals(time_range.clip([('a', 'b', 100), ('a', 'c', 104)]),
+                          ([('a', 'b', 100), ('a', 'c', 104)], []))
+        self.assertEquals(time_range.clip([('a', 'b', 103), ('b', 'c', 105), ('c', 'd', 101)]),
+                          ([('a', 'b', 103)], [('b', 'c', 105), ('c', 'd', 101)]))
+        self.assertFalse(time_range.closed)
+        self.assertEquals(time_range.clip([('a', 'b', 110), ('b', 'c', 111), ('c', 'd', 109)]),
+                          ([], [('a', 'b', 110)]))
+        self.assertTrue(time_range.closed)
+
+
+    def test_open_ended(self):
+        time_range = TimeRange(stop=101)
+        edges = [('a', 'b', 100), ('a', 'c', 101)]
+        self.assertEquals(time_range.clip(edges), ([], edges))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+"""TimeIndex is a sparse event-time to byte-offset index of an input file, for range replays.
+-----
+
+Every `every` lines, the index records the byte offset of the line and the
+latest time-stamp of all lines before it. Time-stamps are not strictly ordered,
+but the latest seen only grows, so the entries are sorted on it.
+
+To replay a time range, reading starts at the last entry whose latest time-stamp
+is behind the window of the range start. Every edge before that entry has
+expired by the range start, so warming the cache from there rebuilds the same
+state as a full run. The range opens at the first event taking the latest
+time-stamp to `start` or past it. It closes before the first event taking it
+past `stop`. So the output is exactly the slice of a full run.
+
+The index is kept next to the input, as `<input>.tidx`, or in an index
+directory given instead. It is built on first use and rebuilt when the input's
+size or modification time changes. Where it can not be written, e.g. beside a
+read-only input, it is only kept in memory for the run. Layout
+(little-endian): the 8 byte magic, a u32 length and a json header, then the
+latest time-stamps and the offsets, each as a raw `array('l')`.
+
+"""
+
+import os
+import json
+import mmap
+import struct
+import logging as log
+
+from array import array
+from bisect import bisect_left
+from mapper import json_to_edge, parse_time_string
+
+
+MAGIC = 'MVDTIDX1'
+SUFFIX = '.tidx'
+EVERY = 4096 # lines between index entries
+_HEADER = struct.Struct('<8sI')
+
+
+def index_path(path, directory=None):
+    """Path of the index of an input file, beside it or in `directory`."""
+    if directory is not None:
+        return os.path.join(directory, os.path.basename(path) + SUFFIX)
+    return path + SUFFIX
+
+
+def parse_bound(value):
+    """Parse a range bound, a unix epoch or a '%Y-%m-%dT%H:%M:%SZ' time."""
+    if value.lstrip('-').isdigit():
+        return int(value)
+    return parse_time_string(value, strict=True)
+
+
+def read_lines(data, offset=0):
+    """Iterate the lines of a memory-mapped file from a byte offset."""
+    data.seek(offset)
+    return iter(data.readline, '')
+
+
+class TimeIndex(object):
+    """Sorted (latest time-stamp, byte offset) entries of an input file.
+
+    Args:
+        latest array('l'): latest time-stamp before each entry
+        offsets array('l'): byte offset of each entry
+
+    """
+
+    def __init__(self, latest, offsets, every=EVERY):
+        self.latest = latest
+        self.offsets = offsets
+        self.every = every
+
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+    def seek(self, lower_bound):
+        """Byte offset to warm up from, so that every edge before it is behind lower_bound."""
+        entry = bisect_left(self.latest, lower_bound) - 1
+        return self.offsets[entry] if entry >= 0 else 0
+
+
+    @classmethod
+    def build(cls, path, every=EVERY):
+        """Scan an input file, recording an entry every `every` lines."""
+        latest, offsets = array('l'), array('l')
+        highest = -1
+        offset = 0
+        with open(path, 'rb') as stream:
+            for i, raw in enumerate(stream):
+                if i % every == 0:
+                    latest.append(highest)
+                    offsets.append(offset)
+                offset += len(raw)
+                timestamp = json_to_edge(raw)[2]
+                if timestamp > highest:
+                    highest = timestamp
+        log.info("indexed %s: %i entries", path, len(offsets))
+        return cls(latest, offsets, every)
+
+
+    def save(self, path, directory=None):
+        """Write the index of an input file, stamped with the input's size and mtime."""
+        status = os.stat(path)
+        header = json.dumps({
+            'size': status.st_size,
+            'mtime': status.st_mtime,
+            'every': self.every,
+            'itemsize': self.offsets.itemsize,
+        })
+        target = index_path(path, directory)
+        with open(target + '.tmp', 'wb') as stream:
+            stream.write(_HEADER.pack(MAGIC, len(header)))
+            stream.write(header)
+            self.latest.tofile(stream)
+            self.offsets.tofile(stream)
+        os.rename(target + '.tmp', target)
+
+
+    @classmethod
+    def load(cls, path, directory=None):
+        """Read the index of an input file, None if it is missing or stale."""
+        target = index_path(path, directory)
+        if not os.path.exists(target):
+            return None
+        status = os.stat(path)
+        with open(target, 'rb') as stream:
+            magic, length = _HEADER.unpack(stream.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError('not a time index file: %s' % target)
+            header = json.loads(stream.read(length))
+            if (header['size'] != status.st_size or header['mtime'] != status.st_mtime
+                    or header['itemsize'] != array('l').itemsize):
+                return None
+            data = array('l')
+            data.fromstring(stream.read())
+        count = len(data) // 2
+        return cls(data[:count], data[count:], header['every'])
+
+
+    @classmethod
+    def open(cls, path, every=EVERY, directory=None):
+        """Load the index of an input file, building and saving it first if needed.
+
+        An index that can not be saved is still returned, for this run only.
+
+        """
+        index = cls.load(path, directory)
+        if index is None or index.every != every:
+            index = cls.build(path, every)
+            try:
+                index.save(path, directory)
+            except (IOError, OSError) as error:
+                log.warning("time index not saved, rebuilt on every run: %s", error)
+        return index
+
+
+class TimeRange(object):
+    """Split a stream of edges into warm-up, in-range and past-the-end parts.
+
+    The range opens at the first edge taking the latest time-stamp to `start`
+    or past it, and closes before the first taking it past `stop`.
+
+    Args:
+        start (int): range start time-stamp, None from the first edge
+        stop (int): range stop time-stamp, inclusive, None to the last edge
+
+    """
+
+    def __init__(self, start=None, stop=None):
+        self.start = start
+        self.stop = stop
+        self.latest = None
+        self.opened = start is None
+        self.closed = False
+
+
+    def clip(self, edges):
+        """Split a batch into edges to warm up on and edges in range, cut at the range end."""
+        latest, start, stop = self.latest, self.start, self.stop
+        first = 0 if self.opened else len(edges)
+        end = len(edges)
+        for i, edge in enumerate(edges):
+            timestamp = edge[2]
+            if latest is None or timestamp > latest:
+                latest = timestamp
+                if not self.opened and latest >= start:
+                    self.opened = True
+                    first = i
+                if stop is not None and latest > stop:
+                    self.closed = True
+                    end = i
+                    break
+        self.latest = latest
+        return edges[:first], edges[first:end]
+
+
+def open_range(path, start, window, every=EVERY, directory=None):
+    """Memory-map an input file, returning its lines from the warm-up offset for a range start."""
+    if os.path.getsize(path) == 0:
+        return iter([])
+    offset = 0
+    if start is not None:
+        offset = TimeIndex.open(path, every, directory).seek(start - window + 1)
+        log.info("warming up from byte %i", offset)
+    with open(path, 'rb') as stream:
+        data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    return read_lines(data, offset)